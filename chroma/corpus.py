@@ -0,0 +1,291 @@
+"""
+Normalized corpus artifact shared by extraction and embedding.
+Extraction writes one JSONL record per source file; embedding and indexing
+stream the records back without touching the document folder or PDFs again.
+
+Record format (one JSON object per line):
+    {
+        "course_id": "COSE33100",
+        "kind": "profile" | "review" | "syllabus",
+        "source": "COSE33100/reviews/review1.txt",
+        "text": "...",
+        "hash": "<sha256 of text>",
+        "fields": {...}   # parsed fields, e.g. course_name for profiles
+    }
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+DEFAULT_CORPUS_PATH = "corpus.jsonl"
+RECORD_KINDS = ("profile", "review", "syllabus")
+
+
+def text_hash(text: str) -> str:
+    """Return the sha256 hex digest of a text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def make_record(
+    course_id: str,
+    kind: str,
+    source: str,
+    text: str,
+    fields: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Build a corpus record for a single source file.
+
+    Args:
+        course_id: Course ID the file belongs to (folder name)
+        kind: One of "profile", "review", "syllabus"
+        source: Path of the source file relative to the document folder
+        text: Extracted text content
+        fields: Optional parsed fields (e.g. course_name)
+
+    Returns:
+        Corpus record dictionary
+    """
+    if kind not in RECORD_KINDS:
+        raise ValueError(f"Unknown record kind '{kind}', expected one of {RECORD_KINDS}")
+
+    return {
+        "course_id": course_id,
+        "kind": kind,
+        "source": source,
+        "text": text,
+        "hash": text_hash(text),
+        "fields": fields or {}
+    }
+
+
+def write_corpus(
+    records: Iterable[Dict[str, Any]],
+    corpus_path: str = DEFAULT_CORPUS_PATH,
+    append: bool = False
+) -> int:
+    """
+    Write corpus records to a JSONL file.
+
+    Args:
+        records: Iterable of corpus records (see make_record)
+        corpus_path: Path of the JSONL artifact (default: "corpus.jsonl")
+        append: If True, append to an existing artifact instead of overwriting
+
+    Returns:
+        Number of records written
+    """
+    path = Path(corpus_path)
+    if path.parent and not path.parent.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+    count = 0
+    with open(path, "a" if append else "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False))
+            f.write("\n")
+            count += 1
+    return count
+
+
+def iter_corpus(corpus_path: str = DEFAULT_CORPUS_PATH) -> Iterator[Dict[str, Any]]:
+    """
+    Stream corpus records from a JSONL file, one line at a time.
+
+    Args:
+        corpus_path: Path of the JSONL artifact
+
+    Yields:
+        Corpus record dictionaries in file order
+    """
+    path = Path(corpus_path)
+    if not path.exists():
+        raise FileNotFoundError(f"Corpus file not found: {corpus_path}")
+
+    with open(path, "r", encoding="utf-8") as f:
+        for line_num, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"Warning: Skipping malformed corpus line {line_num}: {e}")
+
+
+def replace_course_records(
+    course_ids: Iterable[str],
+    records: Iterable[Dict[str, Any]],
+    corpus_path: str = DEFAULT_CORPUS_PATH
+) -> int:
+    """
+    Replace every record of the given courses with fresh records.
+    Appending alone would keep records of files that were deleted or moved
+    out of a course, so the artifact is streamed into a temporary file
+    without the affected courses and the new records are appended.
+
+    Args:
+        course_ids: Courses whose existing records are dropped
+        records: New records for those courses (may be empty for deleted courses)
+        corpus_path: Path of the JSONL artifact
+
+    Returns:
+        Number of new records written
+    """
+    path = Path(corpus_path)
+    affected = set(course_ids)
+    tmp_path = path.with_name(path.name + ".tmp")
+
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        if path.exists():
+            for record in iter_corpus(corpus_path):
+                if record["course_id"] not in affected:
+                    f.write(json.dumps(record, ensure_ascii=False))
+                    f.write("\n")
+    os.replace(tmp_path, path)
+
+    return write_corpus(records, corpus_path=corpus_path, append=True)
+
+
+def group_records(records: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Group corpus records by course.
+    A later record with the same source replaces an earlier one.
+
+    Args:
+        records: Iterable of corpus records
+
+    Returns:
+        Dictionary mapping course_id to:
+            - 'profile': Profile record or None
+            - 'reviews': List of review records
+            - 'syllabi': List of syllabus records
+    """
+    by_source: Dict[str, Dict[str, Any]] = {}
+    for record in records:
+        by_source[record["source"]] = record
+
+    courses: Dict[str, Dict[str, Any]] = {}
+    for record in by_source.values():
+        course = courses.setdefault(
+            record["course_id"],
+            {"profile": None, "reviews": [], "syllabi": []}
+        )
+        if record["kind"] == "profile":
+            course["profile"] = record
+        elif record["kind"] == "review":
+            course["reviews"].append(record)
+        else:
+            course["syllabi"].append(record)
+    return courses
+
+
+def load_courses(corpus_path: str = DEFAULT_CORPUS_PATH) -> Dict[str, Dict[str, Any]]:
+    """
+    Load the corpus artifact grouped by course (see group_records).
+    Because the artifact is append-friendly, a later record with the same
+    source replaces an earlier one.
+
+    Args:
+        corpus_path: Path of the JSONL artifact
+
+    Returns:
+        Dictionary mapping course_id to 'profile', 'reviews' and 'syllabi' records
+    """
+    return group_records(iter_corpus(corpus_path))
+
+
+def index_corpus(corpus_path: str = DEFAULT_CORPUS_PATH) -> Dict[str, Dict[str, int]]:
+    """
+    Build a byte-offset index of the corpus artifact without keeping any text.
+    A later record with the same source replaces an earlier one.
+
+    Args:
+        corpus_path: Path of the JSONL artifact
+
+    Returns:
+        Dictionary mapping course_id to {source: byte offset of its latest line},
+        in order of first appearance
+    """
+    path = Path(corpus_path)
+    if not path.exists():
+        raise FileNotFoundError(f"Corpus file not found: {corpus_path}")
+
+    index: Dict[str, Dict[str, int]] = {}
+    sources: Dict[str, str] = {}
+    with open(path, "rb") as f:
+        offset = 0
+        for line_num, line in enumerate(f, 1):
+            if line.strip():
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    print(f"Warning: Skipping malformed corpus line {line_num}: {e}")
+                else:
+                    previous_course = sources.get(record["source"])
+                    if previous_course is not None and previous_course != record["course_id"]:
+                        # File moved to another course; drop the old entry
+                        index[previous_course].pop(record["source"], None)
+                    sources[record["source"]] = record["course_id"]
+                    index.setdefault(record["course_id"], {})[record["source"]] = offset
+            offset += len(line)
+    return {course_id: offsets for course_id, offsets in index.items() if offsets}
+
+
+def iter_course_groups(
+    corpus_path: str = DEFAULT_CORPUS_PATH
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Stream the corpus artifact one course at a time.
+    Only the byte-offset index (see index_corpus) and the records of the
+    current course are held in memory.
+
+    Args:
+        corpus_path: Path of the JSONL artifact
+
+    Yields:
+        Tuples of (course_id, {'profile', 'reviews', 'syllabi'}) as in group_records
+    """
+    index = index_corpus(corpus_path)
+    with open(corpus_path, "rb") as f:
+        for course_id, offsets in index.items():
+            records = []
+            for offset in sorted(offsets.values()):
+                f.seek(offset)
+                records.append(json.loads(f.readline()))
+            yield course_id, group_records(records)[course_id]
+
+
+def assemble_course_content(
+    course_profile: str,
+    reviews: List[str],
+    syllabi: List[str]
+) -> str:
+    """
+    Combine course profile, reviews and syllabi into one document.
+
+    Args:
+        course_profile: Course profile text (may be empty)
+        reviews: List of review texts
+        syllabi: List of syllabus texts
+
+    Returns:
+        Combined content, or an empty string if there is nothing to combine
+    """
+    combined_parts = []
+
+    if course_profile:
+        combined_parts.append(f"Course Profile:\n{course_profile}")
+
+    if reviews:
+        reviews_text = "\n\n".join([f"Review {i+1}:\n{review}" for i, review in enumerate(reviews)])
+        combined_parts.append(f"\n\nReviews:\n{reviews_text}")
+
+    if syllabi:
+        syllabi_text = "\n\n".join([f"Syllabus {i+1}:\n{syllabus}" for i, syllabus in enumerate(syllabi)])
+        combined_parts.append(f"\n\nSyllabi:\n{syllabi_text}")
+
+    return "\n".join(combined_parts)
@@ -0,0 +1,533 @@
+"""
+Precomputed course k-nearest-neighbor graph.
+"Courses similar to X" is a fixed question for a fixed corpus, so the answer
+is computed offline from the vectors stored in the "courses" collection and
+served from disk instead of running a live vector search.
+
+Index directory layout:
+    knn_index/
+      neighbors.npy  (N, k) structured array of (index, score), memory-mapped on load
+      meta.json      ids (row order), k (stored), requested_k, collection name and
+                     per-course vector hashes
+
+Vectors are spilled to a temporary memory-mapped file and neighbors are written
+row block by row block, so building does not need N x d or N x k in memory.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from vectordb import get_chroma_client
+
+
+DEFAULT_INDEX_DIR = "./knn_index"
+NEIGHBORS_FILE = "neighbors.npy"
+META_FILE = "meta.json"
+# Vectors are spilled here while building and removed afterwards
+VECTORS_TMP_FILE = "vectors.tmp.npy"
+
+# One (neighbor index, cosine similarity) pair; index -1 marks an empty slot
+NEIGHBOR_DTYPE = np.dtype([('index', '<i4'), ('score', '<f4')])
+
+
+def _vector_hashes(matrix: np.ndarray) -> List[str]:
+    """Hash each (normalized, float32) row so changed vectors can be detected."""
+    return [hashlib.sha1(row.tobytes()).hexdigest() for row in matrix]
+
+
+def _merge_topk(
+    idx_a: np.ndarray,
+    score_a: np.ndarray,
+    idx_b: np.ndarray,
+    score_b: np.ndarray,
+    k: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Merge two per-row candidate lists and keep the top-k by score (descending)."""
+    idx = np.concatenate([idx_a, idx_b], axis=1)
+    score = np.concatenate([score_a, score_b], axis=1)
+    if score.shape[1] > k:
+        part = np.argpartition(-score, k - 1, axis=1)[:, :k]
+        idx = np.take_along_axis(idx, part, axis=1)
+        score = np.take_along_axis(score, part, axis=1)
+    order = np.argsort(-score, axis=1, kind='stable')
+    return np.take_along_axis(idx, order, axis=1), np.take_along_axis(score, order, axis=1)
+
+
+def _knn_rows(
+    matrix: np.ndarray,
+    rows: np.ndarray,
+    k: int,
+    block_size: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Exact top-k neighbors (excluding self) for the given rows.
+    Both rows and columns are processed in blocks, so peak memory is
+    block_size x block_size scores regardless of N.
+
+    Returns:
+        Tuple of (neighbor indices int32 (len(rows), k), scores float32 (len(rows), k))
+    """
+    n = matrix.shape[0]
+    best_idx = np.full((len(rows), k), -1, dtype=np.int32)
+    best_score = np.full((len(rows), k), -np.inf, dtype=np.float32)
+
+    for col_start in range(0, n, block_size):
+        col_end = min(col_start + block_size, n)
+        cols = matrix[col_start:col_end]
+        col_ids = np.arange(col_start, col_end, dtype=np.int32)
+
+        for row_start in range(0, len(rows), block_size):
+            row_end = min(row_start + block_size, len(rows))
+            row_ids = rows[row_start:row_end]
+            scores = (matrix[row_ids] @ cols.T).astype(np.float32)
+            # A course is not its own neighbor
+            scores[row_ids[:, None] == col_ids[None, :]] = -np.inf
+
+            cand_idx = np.broadcast_to(col_ids, scores.shape)
+            best_idx[row_start:row_end], best_score[row_start:row_end] = _merge_topk(
+                best_idx[row_start:row_end], best_score[row_start:row_end],
+                cand_idx, scores, k
+            )
+
+    best_idx[np.isneginf(best_score)] = -1
+    return best_idx, best_score
+
+
+def _get_collection(
+    collection_name: str,
+    persist_directory: Optional[str],
+    use_server: bool,
+    server_host: str,
+    server_port: int
+):
+    client = get_chroma_client(
+        persist_directory=persist_directory,
+        use_server=use_server,
+        server_host=server_host,
+        server_port=server_port
+    )
+    return client.get_collection(name=collection_name)
+
+
+def _collection_ids(collection, page_size: int = 1000) -> List[str]:
+    """Page through a collection fetching IDs only."""
+    ids: List[str] = []
+    offset = 0
+    while True:
+        page = collection.get(limit=page_size, offset=offset, include=[])
+        if not page['ids']:
+            break
+        ids.extend(page['ids'])
+        offset += len(page['ids'])
+    return ids
+
+
+def _spill_vectors(
+    collection,
+    ids: List[str],
+    path: Path,
+    page_size: int = 1000
+) -> Tuple[np.ndarray, List[str]]:
+    """
+    Fetch the vectors of the given IDs page by page into a memory-mapped,
+    L2-normalized float32 matrix in the order of ids, so the full N x d
+    matrix is never held in memory. IDs deleted in the meantime stay zero rows.
+
+    Returns:
+        Tuple of (read-only memmap (len(ids), d), per-row vector hashes)
+    """
+    positions = {record_id: i for i, record_id in enumerate(ids)}
+    matrix = None
+    hashes = [""] * len(ids)
+    for start in range(0, len(ids), page_size):
+        page = collection.get(ids=ids[start:start + page_size], include=['embeddings'])
+        if not page['ids']:
+            continue
+        vectors = np.asarray(page['embeddings'], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        vectors = vectors / norms
+        if matrix is None:
+            matrix = np.lib.format.open_memmap(
+                path, mode='w+', dtype=np.float32, shape=(len(ids), vectors.shape[1])
+            )
+        rows = [positions[record_id] for record_id in page['ids']]
+        matrix[rows] = vectors
+        for row, h in zip(rows, _vector_hashes(vectors)):
+            hashes[row] = h
+
+    if matrix is None:
+        return np.zeros((len(ids), 0), dtype=np.float32), hashes
+    matrix.flush()
+    del matrix
+    return np.load(path, mmap_mode='r'), hashes
+
+
+def _open_neighbors(index_dir: Path, n: int, k: int) -> np.ndarray:
+    """Create the temporary on-disk (n, k) neighbor array that blocks are written into."""
+    index_dir.mkdir(parents=True, exist_ok=True)
+    return np.lib.format.open_memmap(
+        index_dir / (NEIGHBORS_FILE + ".tmp"), mode='w+', dtype=NEIGHBOR_DTYPE, shape=(n, k)
+    )
+
+
+def _write_block(neighbors: np.ndarray, start: int, idx: np.ndarray, score: np.ndarray) -> None:
+    neighbors['index'][start:start + len(idx)] = idx
+    neighbors['score'][start:start + len(idx)] = score
+
+
+def _finish_index(
+    index_dir: Path,
+    neighbors: np.ndarray,
+    ids: List[str],
+    k: int,
+    requested_k: int,
+    collection_name: str,
+    hashes: List[str]
+) -> None:
+    """Publish the temporary neighbor array and write meta.json, replacing any existing files atomically."""
+    neighbors.flush()
+    del neighbors
+    os.replace(index_dir / (NEIGHBORS_FILE + ".tmp"), index_dir / NEIGHBORS_FILE)
+
+    tmp_meta = index_dir / (META_FILE + ".tmp")
+    with open(tmp_meta, "w", encoding="utf-8") as f:
+        json.dump({
+            "ids": ids,
+            "k": k,
+            "requested_k": requested_k,
+            "collection_name": collection_name,
+            "vector_hashes": hashes
+        }, f, ensure_ascii=False)
+    os.replace(tmp_meta, index_dir / META_FILE)
+
+
+def _build_from_matrix(
+    index_dir: Path,
+    ids: List[str],
+    matrix: np.ndarray,
+    hashes: List[str],
+    requested_k: int,
+    collection_name: str,
+    block_size: int
+) -> None:
+    """Compute every row's top-k block by block and write each block straight to disk."""
+    n = len(ids)
+    k = max(0, min(requested_k, n - 1))
+    print(f"Building {k}-NN index for {n} course(s)...")
+
+    neighbors = _open_neighbors(index_dir, n, k)
+    for start in range(0, n, block_size):
+        rows = np.arange(start, min(start + block_size, n), dtype=np.int32)
+        idx, score = _knn_rows(matrix, rows, k, block_size)
+        _write_block(neighbors, start, idx, score)
+    _finish_index(index_dir, neighbors, ids, k, requested_k, collection_name, hashes)
+
+
+def build_knn_index(
+    index_dir: str = DEFAULT_INDEX_DIR,
+    k: int = 10,
+    collection_name: str = "courses",
+    persist_directory: Optional[str] = "./chroma_db",
+    use_server: bool = False,
+    server_host: str = "localhost",
+    server_port: int = 8000,
+    block_size: int = 1024
+) -> int:
+    """
+    Compute the all-pairs top-k neighbor list for every course and save it to disk.
+    Vectors are spilled to a temporary memory-mapped file and neighbors are
+    written one row block at a time, so memory stays bounded by block_size
+    rather than the number of courses.
+
+    Args:
+        index_dir: Directory to write the index to (default: "./knn_index")
+        k: Number of neighbors per course. The stored k is capped at N - 1;
+            the requested k is kept so later updates grow back to it
+        collection_name: Name of the collection holding course vectors
+        persist_directory: Directory of the local ChromaDB (used when use_server=False)
+        use_server: If True, use HTTP client to connect to ChromaDB server (default: False)
+        server_host: ChromaDB server host (default: "localhost")
+        server_port: ChromaDB server port (default: 8000)
+        block_size: Rows/columns per matrix-multiply block
+
+    Returns:
+        Number of courses indexed
+    """
+    index_path = Path(index_dir)
+    index_path.mkdir(parents=True, exist_ok=True)
+    collection = _get_collection(collection_name, persist_directory, use_server, server_host, server_port)
+    ids = _collection_ids(collection)
+
+    vectors_path = index_path / VECTORS_TMP_FILE
+    try:
+        matrix, hashes = _spill_vectors(collection, ids, vectors_path)
+        _build_from_matrix(index_path, ids, matrix, hashes, k, collection_name, block_size)
+        del matrix
+    finally:
+        vectors_path.unlink(missing_ok=True)
+
+    print(f"✅ Saved k-NN index to '{index_dir}'")
+    return len(ids)
+
+
+def update_knn_index(
+    index_dir: str = DEFAULT_INDEX_DIR,
+    changed_ids: Optional[Iterable[str]] = None,
+    collection_name: str = "courses",
+    persist_directory: Optional[str] = "./chroma_db",
+    use_server: bool = False,
+    server_host: str = "localhost",
+    server_port: int = 8000,
+    block_size: int = 1024,
+    k: Optional[int] = None
+) -> Dict[str, int]:
+    """
+    Incrementally rebuild the k-NN index after an ingestion run.
+    Only changed/added courses get a full row recompute. Other rows are patched
+    by scoring them against the changed courses; a row is recomputed in full
+    only when a changed or deleted neighbor left a gap that the patch cannot
+    prove is filled correctly. The old index is memory-mapped and the new one
+    is written one row block at a time.
+
+    Args:
+        index_dir: Directory of an existing index (falls back to a full build if missing)
+        changed_ids: Course IDs the ingestion run changed. If None, changes are
+            detected by comparing stored vector hashes
+        collection_name: Name of the collection holding course vectors
+        persist_directory: Directory of the local ChromaDB (used when use_server=False)
+        use_server: If True, use HTTP client to connect to ChromaDB server (default: False)
+        server_host: ChromaDB server host (default: "localhost")
+        server_port: ChromaDB server port (default: 8000)
+        block_size: Rows/columns per matrix-multiply block
+        k: Requested neighbors per course (default: the index's requested k,
+            or 10 for a new index). A different value forces a full rebuild
+
+    Returns:
+        Dictionary with counts: 'changed', 'added', 'deleted', 'recomputed' (full
+        row recomputes) and 'reused' (rows kept or patched without a full recompute)
+    """
+    index_path = Path(index_dir)
+    if not (index_path / META_FILE).exists() or not (index_path / NEIGHBORS_FILE).exists():
+        print(f"No existing index in '{index_dir}', running full build")
+        n = build_knn_index(
+            index_dir, k=k if k is not None else 10, collection_name=collection_name,
+            persist_directory=persist_directory, use_server=use_server,
+            server_host=server_host, server_port=server_port, block_size=block_size
+        )
+        return {'changed': 0, 'added': n, 'deleted': 0, 'recomputed': n, 'reused': 0}
+
+    with open(index_path / META_FILE, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    old_ids: List[str] = meta["ids"]
+    old_hashes = dict(zip(old_ids, meta["vector_hashes"]))
+    old_k = meta["k"]
+    # Indexes written before requested_k was stored asked for exactly k
+    requested_k = k if k is not None else meta.get("requested_k", old_k)
+
+    collection = _get_collection(collection_name, persist_directory, use_server, server_host, server_port)
+    current_ids = _collection_ids(collection)
+    current = set(current_ids)
+
+    # Keep surviving courses in their old order and append new ones, so most
+    # stored neighbor indices only need a remap
+    new_ids = [course_id for course_id in old_ids if course_id in current]
+    new_ids += [course_id for course_id in current_ids if course_id not in old_hashes]
+    n = len(new_ids)
+
+    vectors_path = index_path / VECTORS_TMP_FILE
+    try:
+        matrix, hashes = _spill_vectors(collection, new_ids, vectors_path)
+        stats = _update_from_matrix(
+            index_path, old_ids, old_hashes, old_k, requested_k, new_ids, matrix, hashes,
+            changed_ids, collection_name, block_size
+        )
+        del matrix
+    finally:
+        vectors_path.unlink(missing_ok=True)
+
+    print(f"✅ Updated k-NN index in '{index_dir}': {stats}")
+    return stats
+
+
+def _update_from_matrix(
+    index_path: Path,
+    old_ids: List[str],
+    old_hashes: Dict[str, str],
+    old_k: int,
+    requested_k: int,
+    new_ids: List[str],
+    matrix: np.ndarray,
+    hashes: List[str],
+    changed_ids: Optional[Iterable[str]],
+    collection_name: str,
+    block_size: int
+) -> Dict[str, int]:
+    n = len(new_ids)
+    new_pos = {course_id: i for i, course_id in enumerate(new_ids)}
+
+    added = {course_id for course_id in new_ids if course_id not in old_hashes}
+    deleted = [course_id for course_id in old_ids if course_id not in new_pos]
+    if changed_ids is None:
+        changed = {
+            course_id for course_id, h in zip(new_ids, hashes)
+            if course_id in old_hashes and old_hashes[course_id] != h
+        }
+    else:
+        changed = {course_id for course_id in changed_ids if course_id in old_hashes and course_id in new_pos}
+
+    k = max(0, min(requested_k, n - 1))
+    if k != old_k or k == 0:
+        # Neighbor lists change shape: the corpus shrank below k + 1, grew back
+        # towards the requested k, a different k was requested, or it was empty
+        _build_from_matrix(index_path, new_ids, matrix, hashes, requested_k, collection_name, block_size)
+        return {'changed': len(changed), 'added': len(added), 'deleted': len(deleted),
+                'recomputed': n, 'reused': 0}
+
+    old_neighbors = np.load(index_path / NEIGHBORS_FILE, mmap_mode='r')
+    # Trailing -1 makes empty slots (index -1) map to -1 as well
+    remap = np.array([new_pos.get(course_id, -1) for course_id in old_ids] + [-1], dtype=np.int32)
+    dirty_mask = np.zeros(n, dtype=bool)
+    dirty_mask[[new_pos[course_id] for course_id in changed | added]] = True
+    dirty_rows = np.flatnonzero(dirty_mask).astype(np.int32)
+    # Surviving rows come first in new_ids, in their old order
+    survivors = np.array([i for i, course_id in enumerate(old_ids) if course_id in new_pos], dtype=np.int64)
+
+    neighbors = _open_neighbors(index_path, n, k)
+    recomputed = 0
+    for start in range(0, n, block_size):
+        end = min(start + block_size, n)
+        rows = np.arange(start, end, dtype=np.int32)
+
+        # Carry over surviving rows with remapped neighbor indices
+        idx = np.full((len(rows), k), -1, dtype=np.int32)
+        score = np.full((len(rows), k), -np.inf, dtype=np.float32)
+        carried = min(end, len(survivors)) - start
+        if carried > 0:
+            old_block = old_neighbors[survivors[start:start + carried]]
+            idx[:carried] = remap[old_block['index']]
+            score[:carried] = old_block['score']
+        # The old k-th score bounds every unseen (unchanged) neighbor from above
+        threshold = score[:, -1].copy()
+
+        # Drop entries pointing at deleted or changed courses
+        stale = (idx < 0) | dirty_mask[np.clip(idx, 0, None)]
+        idx[stale] = -1
+        score[stale] = -np.inf
+
+        # Patch clean rows against the changed/added courses only
+        clean = ~dirty_mask[rows]
+        if len(dirty_rows) and clean.any():
+            for dirty_start in range(0, len(dirty_rows), block_size):
+                cols = dirty_rows[dirty_start:dirty_start + block_size]
+                scores = (matrix[rows[clean]] @ matrix[cols].T).astype(np.float32)
+                cand_idx = np.broadcast_to(cols, scores.shape)
+                idx[clean], score[clean] = _merge_topk(idx[clean], score[clean], cand_idx, scores, k)
+
+        # Rows that lost a neighbor are exact only if the patched k-th score
+        # still beats every unchanged course that was not in the old list
+        unproven = clean & stale.any(axis=1) & (score[:, -1] < threshold)
+        recompute = ~clean | unproven
+        if recompute.any():
+            idx[recompute], score[recompute] = _knn_rows(matrix, rows[recompute], k, block_size)
+            recomputed += int(recompute.sum())
+
+        _write_block(neighbors, start, idx, score)
+
+    del old_neighbors
+    _finish_index(index_path, neighbors, new_ids, k, requested_k, collection_name, hashes)
+    return {'changed': len(changed), 'added': len(added), 'deleted': len(deleted),
+            'recomputed': recomputed, 'reused': n - recomputed}
+
+
+def knn_update_hook(index_dir: str = DEFAULT_INDEX_DIR, **kwargs) -> Callable[[List[str]], Dict[str, int]]:
+    """
+    Build a callback that passes a batch's changed course IDs to update_knn_index,
+    e.g. as DocumentWatcher(on_batch=...).
+
+    Args:
+        index_dir: Directory of the k-NN index
+        **kwargs: Other update_knn_index arguments (collection_name,
+            persist_directory, use_server, server_host, server_port, block_size, k)
+
+    Returns:
+        Callable taking the list of upserted/deleted course IDs
+    """
+    def on_batch(changed_ids: List[str]) -> Dict[str, int]:
+        return update_knn_index(index_dir, changed_ids=changed_ids, **kwargs)
+    return on_batch
+
+
+class CourseKNNIndex:
+    """
+    Read-only, memory-mapped view of a k-NN index with O(1) lookup by course_id.
+
+    Example:
+        >>> index = CourseKNNIndex("./knn_index")
+        >>> for neighbor in index.neighbors("COSE10102", top_k=5):
+        ...     print(neighbor['id'], neighbor['similarity'])
+    """
+
+    def __init__(self, index_dir: str = DEFAULT_INDEX_DIR):
+        index_path = Path(index_dir)
+        with open(index_path / META_FILE, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.ids: List[str] = meta["ids"]
+        self.k: int = meta["k"]
+        self.collection_name: str = meta["collection_name"]
+        self._rows = {course_id: i for i, course_id in enumerate(self.ids)}
+        self._neighbors = np.load(index_path / NEIGHBORS_FILE, mmap_mode='r')
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, course_id: str) -> bool:
+        return course_id in self._rows
+
+    def neighbors(self, course_id: str, top_k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Return the precomputed nearest neighbors of a course.
+
+        Args:
+            course_id: Course ID to look up
+            top_k: Number of neighbors to return (default: all k stored)
+
+        Returns:
+            List of {'id', 'similarity'} sorted by similarity, or an empty list
+            if the course is not in the index
+        """
+        row = self._rows.get(course_id)
+        if row is None:
+            return []
+        entries = self._neighbors[row, :top_k if top_k is not None else self.k]
+        return [
+            {'id': self.ids[int(entry['index'])], 'similarity': float(entry['score'])}
+            for entry in entries
+            if entry['index'] >= 0
+        ]
+
+
+if __name__ == "__main__":
+    import sys
+
+    # 사용 예시:
+    #   python course_knn.py build          # 전체 인덱스 생성
+    #   python course_knn.py update         # 변경된 강의만 재계산
+    #   python course_knn.py COSE10102      # 유사 강의 조회
+    command = sys.argv[1] if len(sys.argv) > 1 else "build"
+
+    if command == "build":
+        build_knn_index()
+    elif command == "update":
+        update_knn_index()
+    else:
+        index = CourseKNNIndex()
+        results = index.neighbors(command)
+        if not results:
+            print(f"Course '{command}' not found in k-NN index")
+        for i, neighbor in enumerate(results, 1):
+            print(f"{i}. {neighbor['id']} (similarity: {neighbor['similarity']:.4f})")
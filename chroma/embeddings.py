@@ -61,6 +61,37 @@ def embedding(
     return response.data[0].embedding
 
 
+def embedding_batch(
+    texts: List[str],
+    model: str = "text-embedding-ada-002"
+) -> List[List[float]]:
+    """
+    Convert several texts into embedding vectors with a single OpenAI request.
+    
+    Args:
+        texts: The texts to convert
+        model: The OpenAI embedding model to use (see embedding)
+    
+    Returns:
+        List of embedding vectors, in the same order as texts
+    """
+    if not texts:
+        return []
+    
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("OPENAI_API_KEY not found in config file or environment variable")
+    
+    client = OpenAI(api_key=api_key)
+    
+    response = client.embeddings.create(
+        model=model,
+        input=texts
+    )
+    
+    return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+
 if __name__ == "__main__":
     # Example usage
     text = "Explain Fourier series simply"
@@ -4,11 +4,19 @@ Preserves the folder hierarchy: course_name -> review/syllabus/course_id
 """
 import os
 import re
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
 from pypdf import PdfReader
-from embeddings import embedding
+from embeddings import embedding_batch
 from vectordb import add_documents_to_vectordb
+from corpus import (
+    DEFAULT_CORPUS_PATH,
+    make_record,
+    text_hash,
+    write_corpus,
+    iter_course_groups,
+    assemble_course_content
+)
 
 
 def extract_text_from_pdf(pdf_path: str) -> str:
@@ -54,37 +62,117 @@ def read_text_file(file_path: Path) -> str:
         raise Exception(f"Error reading text file {file_path}: {e}")
 
 
-def process_document_folder(
-    document_folder: str = "document",
-    model: str = "text-embedding-ada-002",
-    persist_directory: str = "./chroma_db"
-) -> None:
+def extract_course_records(
+    course_folder: Path,
+    document_root: Path
+) -> List[Dict[str, Any]]:
     """
-    Process all files in the document folder structure and save to vector database.
-    Combines all reviews and syllabi for each course into one document per course.
-    Creates a single "courses" collection with one embedding per course ID.
-    Includes course_profile.txt content in embedding generation for context.
+    Extract corpus records for a single course folder.
+    Reads course_profile.txt, reviews/ and syllabus/ and returns one record
+    per source file (see corpus.make_record).
     
     Args:
-        document_folder: Path to the document folder (default: "document")
-        model: The embedding model to use (default: "text-embedding-ada-002")
-        persist_directory: Directory to persist ChromaDB (default: "./chroma_db")
+        course_folder: Path to the course folder (folder name IS the course ID)
+        document_root: Root document folder, used to build relative source paths
     
-    Structure processed:
-        document/
-          {course_id}/  (folder name IS the course ID, e.g., COSE33100)
-            reviews/
-              {file}.txt (all combined)
-            syllabus/
-              {file}.txt or .pdf (all combined)
-            course_profile.txt  (included in combined content, contains Course ID and Course Name)
+    Returns:
+        List of corpus records for the course
+    """
+    # Folder name IS the course ID
+    course_id = course_folder.name
+    records = []
     
-    Each course ID gets one embedding that combines:
-        - Course profile (includes Course ID and Course Name)
-        - All reviews (combined)
-        - All syllabi (combined)
+    def source_of(file_path: Path) -> str:
+        return file_path.relative_to(document_root).as_posix()
     
-    Document ID in ChromaDB is the course_id (one embedding per course ID).
+    # Read course_profile.txt for context
+    course_profile_file = course_folder / "course_profile.txt"
+    if course_profile_file.exists():
+        try:
+            course_profile = read_text_file(course_profile_file)
+            if course_profile:
+                print(f"  Found course profile ({len(course_profile)} characters)")
+                fields = {}
+                # Extract Course Name from course_profile.txt
+                course_name_match = re.search(r'Course Name:\s*([^\n]+)', course_profile)
+                if course_name_match:
+                    fields["course_name"] = course_name_match.group(1).strip()
+                    print(f"  Found Course Name: {fields['course_name']}")
+                
+                # Verify Course ID matches folder name
+                course_id_match = re.search(r'Course ID:\s*([^\n]+)', course_profile)
+                if course_id_match:
+                    profile_course_id = course_id_match.group(1).strip()
+                    fields["profile_course_id"] = profile_course_id
+                    if profile_course_id != course_id:
+                        print(f"    Warning: Course ID mismatch! Folder: {course_id}, Profile: {profile_course_id}")
+                
+                records.append(make_record(course_id, "profile", source_of(course_profile_file), course_profile, fields))
+        except Exception as e:
+            print(f"    Warning: Could not read course_profile.txt: {e}")
+    
+    # Collect all reviews for this course
+    reviews_folder = course_folder / "reviews"
+    if reviews_folder.exists() and reviews_folder.is_dir():
+        review_files = list(reviews_folder.glob("*.txt"))
+        for review_file in review_files:
+            try:
+                print(f"  Reading review: {review_file.name}")
+                content = read_text_file(review_file)
+                
+                if content:
+                    records.append(make_record(course_id, "review", source_of(review_file), content))
+                else:
+                    print(f"    Warning: Skipping empty file: {review_file.name}")
+                
+            except Exception as e:
+                print(f"    Error reading {review_file.name}: {e}")
+    
+    # Collect all syllabi for this course
+    syllabus_folder = course_folder / "syllabus"
+    if syllabus_folder.exists() and syllabus_folder.is_dir():
+        syllabus_files = list(syllabus_folder.glob("*.*"))
+        for syllabus_file in syllabus_files:
+            try:
+                print(f"  Reading syllabus: {syllabus_file.name}")
+                
+                # Extract text based on file type
+                if syllabus_file.suffix.lower() == '.pdf':
+                    content = extract_text_from_pdf(str(syllabus_file))
+                else:  # .txt
+                    content = read_text_file(syllabus_file)
+                
+                if content:
+                    records.append(make_record(
+                        course_id, "syllabus", source_of(syllabus_file), content,
+                        {"file_type": syllabus_file.suffix.lower().lstrip('.')}
+                    ))
+                else:
+                    print(f"    Warning: Skipping empty file: {syllabus_file.name}")
+                
+            except Exception as e:
+                print(f"    Error reading {syllabus_file.name}: {e}")
+    
+    return records
+
+
+def extract_document_folder(
+    document_folder: str = "document",
+    corpus_path: str = DEFAULT_CORPUS_PATH,
+    append: bool = False
+) -> int:
+    """
+    Extract all files in the document folder into the normalized corpus artifact.
+    This is the only step that reads the raw .txt/.pdf files; embedding and
+    indexing run from the artifact alone (see embed_corpus).
+    
+    Args:
+        document_folder: Path to the document folder (default: "document")
+        corpus_path: Path of the JSONL artifact to write (default: "corpus.jsonl")
+        append: If True, append to an existing artifact (later records win)
+    
+    Returns:
+        Number of records written
     """
     doc_path = Path(document_folder)
     
@@ -99,154 +187,207 @@ def process_document_folder(
     
     if not course_folders:
         print(f"No course folders found in '{document_folder}'")
-        return
+        return 0
     
     print(f"Found {len(course_folders)} course folder(s)")
     print("=" * 60)
     
-    # Lists for combined course documents (one per course)
+    def all_records():
+        for course_folder in course_folders:
+            print(f"\nProcessing course: {course_folder.name}")
+            yield from extract_course_records(course_folder, doc_path)
+    
+    count = write_corpus(all_records(), corpus_path=corpus_path, append=append)
+    print(f"\nWrote {count} record(s) to '{corpus_path}'")
+    return count
+
+
+def build_course_documents(
+    courses: Dict[str, Dict[str, Any]],
+    embedding_model: Optional[str] = None
+) -> Tuple[List[str], List[Dict[str, Any]], List[str]]:
+    """
+    Assemble one combined document per course from grouped corpus records.
+    
+    Args:
+        courses: Grouped courses (corpus.load_courses or corpus.iter_course_groups)
+        embedding_model: Model the texts will be embedded with; stored in each
+            record's metadata so a re-embed with another model changes the record
+    
+    Returns:
+        Tuple of (texts, metadatas, ids), one entry per course with content
+    """
     course_texts = []
-    course_embeddings = []
     course_metadatas = []
     course_ids = []
     
-    for course_folder in course_folders:
-        # Folder name IS the course ID
-        course_id = course_folder.name
-        print(f"\nProcessing course: {course_id}")
-        
-        # Read course_profile.txt for context
-        course_profile_file = course_folder / "course_profile.txt"
-        course_profile = ""
-        course_name = ""
-        if course_profile_file.exists():
-            try:
-                course_profile = read_text_file(course_profile_file)
-                if course_profile:
-                    print(f"  Found course profile ({len(course_profile)} characters)")
-                    # Extract Course Name from course_profile.txt
-                    course_name_match = re.search(r'Course Name:\s*([^\n]+)', course_profile)
-                    if course_name_match:
-                        course_name = course_name_match.group(1).strip()
-                        print(f"  Found Course Name: {course_name}")
-                    
-                    # Verify Course ID matches folder name
-                    course_id_match = re.search(r'Course ID:\s*([^\n]+)', course_profile)
-                    if course_id_match:
-                        profile_course_id = course_id_match.group(1).strip()
-                        if profile_course_id != course_id:
-                            print(f"    Warning: Course ID mismatch! Folder: {course_id}, Profile: {profile_course_id}")
-            except Exception as e:
-                print(f"    Warning: Could not read course_profile.txt: {e}")
-        
-        # Collect all reviews for this course
-        all_reviews = []
-        reviews_folder = course_folder / "reviews"
-        if reviews_folder.exists() and reviews_folder.is_dir():
-            review_files = list(reviews_folder.glob("*.txt"))
-            for review_file in review_files:
-                try:
-                    print(f"  Reading review: {review_file.name}")
-                    content = read_text_file(review_file)
-                    
-                    if content:
-                        all_reviews.append(content)
-                    else:
-                        print(f"    Warning: Skipping empty file: {review_file.name}")
-                    
-                except Exception as e:
-                    print(f"    Error reading {review_file.name}: {e}")
-        
-        # Collect all syllabi for this course
-        all_syllabi = []
-        syllabus_folder = course_folder / "syllabus"
-        if syllabus_folder.exists() and syllabus_folder.is_dir():
-            syllabus_files = list(syllabus_folder.glob("*.*"))
-            for syllabus_file in syllabus_files:
-                try:
-                    print(f"  Reading syllabus: {syllabus_file.name}")
-                    
-                    # Extract text based on file type
-                    if syllabus_file.suffix.lower() == '.pdf':
-                        content = extract_text_from_pdf(str(syllabus_file))
-                    else:  # .txt
-                        content = read_text_file(syllabus_file)
-                    
-                    if content:
-                        all_syllabi.append(content)
-                    else:
-                        print(f"    Warning: Skipping empty file: {syllabus_file.name}")
-                    
-                except Exception as e:
-                    print(f"    Error reading {syllabus_file.name}: {e}")
-        
-        # Combine all content: course profile + all reviews + all syllabi
-        combined_parts = []
-        
-        if course_profile:
-            combined_parts.append(f"Course Profile:\n{course_profile}")
-        
-        if all_reviews:
-            reviews_text = "\n\n".join([f"Review {i+1}:\n{review}" for i, review in enumerate(all_reviews)])
-            combined_parts.append(f"\n\nReviews:\n{reviews_text}")
+    for course_id, course in courses.items():
+        profile = course["profile"]
+        course_profile = profile["text"] if profile else ""
+        course_name = profile["fields"].get("course_name", "") if profile else ""
+        all_reviews = [record["text"] for record in course["reviews"]]
+        all_syllabi = [record["text"] for record in course["syllabi"]]
         
-        if all_syllabi:
-            syllabi_text = "\n\n".join([f"Syllabus {i+1}:\n{syllabus}" for i, syllabus in enumerate(all_syllabi)])
-            combined_parts.append(f"\n\nSyllabi:\n{syllabi_text}")
-        
-        if not combined_parts:
+        combined_content = assemble_course_content(course_profile, all_reviews, all_syllabi)
+        if not combined_content:
             print(f"    Warning: No content found for course {course_id}, skipping...")
             continue
         
-        # Combine all parts into one document
-        combined_content = "\n".join(combined_parts)
-        
+        print(f"\nCourse: {course_id}")
         print(f"  Combined content: {len(combined_content)} characters")
         print(f"    - Course profile: {'Yes' if course_profile else 'No'}")
         print(f"    - Reviews: {len(all_reviews)} file(s)")
         print(f"    - Syllabi: {len(all_syllabi)} file(s)")
         
-        # Generate embedding for the combined content
-        embedding_vector = embedding(combined_content, model=model)
-        
-        # Store the combined content
         course_texts.append(combined_content)
-        course_embeddings.append(embedding_vector)
         course_metadatas.append({
             "course_id": course_id,  # Primary identifier
             "course_name": course_name if course_name else course_id,  # Fallback to course_id if name not found
             "source": "document",
             "has_course_profile": bool(course_profile),
             "num_reviews": len(all_reviews),
-            "num_syllabi": len(all_syllabi)
+            "num_syllabi": len(all_syllabi),
+            "content_hash": text_hash(combined_content)  # Lets sync_stores.py diff without fetching documents
         })
+        if embedding_model:
+            course_metadatas[-1]["embedding_model"] = embedding_model
         # Use course_id as the document ID (one embedding per course ID)
         course_ids.append(course_id)
     
-    # Save all courses to "courses" collection (one document per course)
-    if course_texts:
-        print("\n" + "=" * 60)
-        print(f"Adding {len(course_texts)} course document(s) to ChromaDB...")
+    return course_texts, course_metadatas, course_ids
+
+
+def embed_corpus(
+    corpus_path: str = DEFAULT_CORPUS_PATH,
+    model: str = "text-embedding-ada-002",
+    persist_directory: str = "./chroma_db",
+    hnsw_config: Optional[Dict[str, Any]] = None,
+    batch_size: int = 32
+) -> int:
+    """
+    Embed courses from the normalized corpus artifact and save them to the
+    "courses" collection. Does not read the document folder.
+    
+    The artifact is streamed one course at a time (see corpus.iter_course_groups)
+    and courses are embedded and written in batches of batch_size, so memory
+    stays bounded by one batch regardless of corpus size.
+    
+    Args:
+        corpus_path: Path of the JSONL artifact (default: "corpus.jsonl")
+        model: The embedding model to use (default: "text-embedding-ada-002")
+        persist_directory: Directory to persist ChromaDB (default: "./chroma_db")
+        hnsw_config: Optional HNSW settings for the "courses" collection, passed to
+            add_documents_to_vectordb (keys: distance_metric, hnsw_m,
+            hnsw_construction_ef, hnsw_search_ef)
+        batch_size: Number of courses per embedding request and ChromaDB write (default: 32)
+    
+    Returns:
+        Number of course documents saved
+    """
+    print(f"Streaming courses from '{corpus_path}'")
+    print("=" * 60)
+    
+    saved = 0
+    batch_texts: List[str] = []
+    batch_metadatas: List[Dict[str, Any]] = []
+    batch_ids: List[str] = []
+    
+    def flush() -> None:
+        nonlocal saved
+        if not batch_texts:
+            return
+        print(f"\nEmbedding and saving {len(batch_texts)} course document(s)...")
         add_documents_to_vectordb(
-            texts=course_texts,
-            embeddings=course_embeddings,
-            metadatas=course_metadatas,
-            ids=course_ids,
+            texts=batch_texts,
+            embeddings=embedding_batch(batch_texts, model=model),
+            metadatas=batch_metadatas,
+            ids=batch_ids,
             collection_name="courses",
             persist_directory=persist_directory,
-            clear_existing=True,  # Clear collection to avoid duplicates
+            clear_existing=(saved == 0),  # Clear collection once, before the first batch
             embedding_model=model,
             use_server=True,  # 서버 모드 사용
             server_host="localhost",
-            server_port=8000
+            server_port=8000,
+            upsert=True,
+            **(hnsw_config or {})
         )
+        saved += len(batch_texts)
+        batch_texts.clear()
+        batch_metadatas.clear()
+        batch_ids.clear()
+    
+    for course_id, course in iter_course_groups(corpus_path):
+        texts, metadatas, ids = build_course_documents({course_id: course}, embedding_model=model)
+        batch_texts.extend(texts)
+        batch_metadatas.extend(metadatas)
+        batch_ids.extend(ids)
+        if len(batch_texts) >= batch_size:
+            flush()
+    flush()
+    
+    if saved:
         print("✅ Successfully saved courses to 'courses' collection!")
     else:
         print("\nNo course documents to save")
     
+    return saved
+
+
+def process_document_folder(
+    document_folder: str = "document",
+    model: str = "text-embedding-ada-002",
+    persist_directory: str = "./chroma_db",
+    corpus_path: str = DEFAULT_CORPUS_PATH,
+    hnsw_config: Optional[Dict[str, Any]] = None
+) -> None:
+    """
+    Process all files in the document folder structure and save to vector database.
+    Combines all reviews and syllabi for each course into one document per course.
+    Creates a single "courses" collection with one embedding per course ID.
+    Includes course_profile.txt content in embedding generation for context.
+    
+    Runs in two stages: extract_document_folder writes the normalized corpus
+    artifact, then embed_corpus embeds and indexes from that artifact. To try
+    a new model or assembly format, call embed_corpus on an existing artifact.
+    
+    Args:
+        document_folder: Path to the document folder (default: "document")
+        model: The embedding model to use (default: "text-embedding-ada-002")
+        persist_directory: Directory to persist ChromaDB (default: "./chroma_db")
+        corpus_path: Path of the intermediate JSONL artifact (default: "corpus.jsonl")
+        hnsw_config: Optional HNSW settings for the "courses" collection
+            (e.g. {"distance_metric": "cosine", "hnsw_m": 32}); see embed_corpus
+    
+    Structure processed:
+        document/
+          {course_id}/  (folder name IS the course ID, e.g., COSE33100)
+            reviews/
+              {file}.txt (all combined)
+            syllabus/
+              {file}.txt or .pdf (all combined)
+            course_profile.txt  (included in combined content, contains Course ID and Course Name)
+    
+    Each course ID gets one embedding that combines:
+        - Course profile (includes Course ID and Course Name)
+        - All reviews (combined)
+        - All syllabi (combined)
+    
+    Document ID in ChromaDB is the course_id (one embedding per course ID).
+    """
+    extract_document_folder(document_folder, corpus_path=corpus_path)
+    
+    print("\n" + "=" * 60)
+    num_courses = embed_corpus(
+        corpus_path,
+        model=model,
+        persist_directory=persist_directory,
+        hnsw_config=hnsw_config
+    )
+    
     print("\n" + "=" * 60)
     print("✅ Processing complete!")
-    print(f"   Courses collection: {len(course_texts)} documents")
+    print(f"   Courses collection: {num_courses} documents")
 
 
 if __name__ == "__main__":
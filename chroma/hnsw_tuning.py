@@ -0,0 +1,277 @@
+"""
+HNSW recall/latency tuning sweep.
+Rebuilds a collection under a grid of HNSW settings against a local
+PersistentClient and reports, for each setting:
+    - recall@k against exact brute-force search
+    - p50 / p99 single-query latency
+    - build time
+
+Vectors come from an existing collection (local or server), so the sweep
+runs on the real course embeddings without calling the embedding API.
+"""
+import itertools
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import chromadb
+import numpy as np
+
+from transcript_scorer import load_course_matrix
+from vectordb import get_chroma_client, hnsw_metadata
+
+
+DEFAULT_GRID: Dict[str, List[Any]] = {
+    "distance_metric": ["cosine"],
+    "m": [8, 16, 32],
+    "construction_ef": [100, 200],
+    "search_ef": [10, 50, 100],
+}
+
+
+def exact_neighbors(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    k: int,
+    distance_metric: str
+) -> np.ndarray:
+    """
+    Brute-force top-k neighbor indices using the same distance as Chroma.
+
+    Args:
+        vectors: (N, d) stored vectors
+        queries: (Q, d) query vectors
+        k: Number of neighbors
+        distance_metric: "l2", "cosine" or "ip"
+
+    Returns:
+        (Q, k) array of indices into vectors, nearest first
+    """
+    if distance_metric == "cosine":
+        v = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        q = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        distances = 1.0 - q @ v.T
+    elif distance_metric == "ip":
+        distances = 1.0 - queries @ vectors.T
+    else:
+        # Squared L2, as used by hnswlib
+        distances = (
+            (queries ** 2).sum(axis=1, keepdims=True)
+            - 2.0 * queries @ vectors.T
+            + (vectors ** 2).sum(axis=1)[None, :]
+        )
+
+    part = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    order = np.argsort(np.take_along_axis(distances, part, axis=1), axis=1)
+    return np.take_along_axis(part, order, axis=1)
+
+
+def _drop_self(neighbors: List[List[int]], query_rows: List[int], k: int) -> List[List[int]]:
+    """Remove each query's own row from its neighbor list and keep the first k."""
+    return [
+        [row for row in row_neighbors if row != query_row][:k]
+        for row_neighbors, query_row in zip(neighbors, query_rows)
+    ]
+
+
+def _build_collection(
+    client,
+    name: str,
+    ids: List[str],
+    vectors: np.ndarray,
+    metadata: Dict[str, Any]
+) -> float:
+    """Create a collection with the given HNSW metadata, add all vectors and return build seconds."""
+    try:
+        client.delete_collection(name=name)
+    except Exception:
+        # Collection doesn't exist, which is fine
+        pass
+
+    start = time.perf_counter()
+    collection = client.create_collection(name=name, metadata=metadata)
+    batch_size = client.get_max_batch_size()
+    for offset in range(0, len(ids), batch_size):
+        collection.add(
+            ids=ids[offset:offset + batch_size],
+            embeddings=vectors[offset:offset + batch_size].tolist()
+        )
+    return time.perf_counter() - start
+
+
+def run_sweep(
+    ids: List[str],
+    vectors: np.ndarray,
+    grid: Optional[Dict[str, List[Any]]] = None,
+    k: int = 10,
+    num_queries: int = 100,
+    work_directory: Optional[str] = None,
+    seed: int = 0
+) -> List[Dict[str, Any]]:
+    """
+    Build and query a collection for every combination in the grid.
+
+    Args:
+        ids: Record IDs
+        vectors: (N, d) vectors to index
+        grid: Mapping of hnsw_metadata argument name to candidate values
+            (default: DEFAULT_GRID)
+        k: Number of neighbors for recall@k (default: 10)
+        num_queries: Number of stored vectors sampled as queries (default: 100);
+            a query's own record is excluded so it is not counted as a free hit
+        work_directory: PersistentClient path (default: a temporary directory,
+            removed afterwards)
+        seed: Random seed for query sampling
+
+    Returns:
+        List of result dictionaries, one per setting, containing the setting
+        plus 'recall', 'p50_ms', 'p99_ms' and 'build_s'
+    """
+    grid = grid or DEFAULT_GRID
+    # Queries are stored vectors, so one extra neighbor is fetched and the
+    # query's own record is dropped from both the truth and the results
+    k = min(k, len(ids) - 1)
+    if k <= 0:
+        print("Need at least two vectors to measure recall")
+        return []
+    rng = np.random.default_rng(seed)
+    query_rows = rng.choice(len(ids), size=min(num_queries, len(ids)), replace=False)
+    queries = vectors[query_rows]
+    id_to_row = {course_id: i for i, course_id in enumerate(ids)}
+
+    cleanup = work_directory is None
+    path = work_directory or tempfile.mkdtemp(prefix="hnsw_tuning_")
+    client = chromadb.PersistentClient(path=path)
+
+    truth_cache: Dict[str, List[List[int]]] = {}
+    keys = list(grid.keys())
+    results = []
+
+    try:
+        for values in itertools.product(*(grid[key] for key in keys)):
+            setting = dict(zip(keys, values))
+            metadata = hnsw_metadata(**setting)
+            distance_metric = metadata.get("hnsw:space", "l2")
+
+            if distance_metric not in truth_cache:
+                truth_cache[distance_metric] = _drop_self(
+                    exact_neighbors(vectors, queries, k + 1, distance_metric).tolist(),
+                    query_rows.tolist(),
+                    k
+                )
+            truth = truth_cache[distance_metric]
+
+            build_s = _build_collection(client, "hnsw_tuning", ids, vectors, metadata)
+            collection = client.get_collection(name="hnsw_tuning")
+
+            latencies = []
+            hits = 0
+            for q, query in enumerate(queries):
+                start = time.perf_counter()
+                response = collection.query(
+                    query_embeddings=[query.tolist()],
+                    n_results=k + 1,
+                    include=[]
+                )
+                latencies.append((time.perf_counter() - start) * 1000.0)
+                found = _drop_self(
+                    [[id_to_row[course_id] for course_id in response['ids'][0]]],
+                    [query_rows[q]],
+                    k
+                )[0]
+                hits += len(set(found).intersection(truth[q]))
+
+            result = dict(setting)
+            result.update({
+                "recall": hits / float(len(queries) * k),
+                "p50_ms": float(np.percentile(latencies, 50)),
+                "p99_ms": float(np.percentile(latencies, 99)),
+                "build_s": build_s
+            })
+            results.append(result)
+            print(
+                f"  {setting}: recall@{k}={result['recall']:.4f} "
+                f"p50={result['p50_ms']:.2f}ms p99={result['p99_ms']:.2f}ms "
+                f"build={result['build_s']:.2f}s"
+            )
+    finally:
+        try:
+            client.delete_collection(name="hnsw_tuning")
+        except Exception:
+            pass
+        if cleanup:
+            shutil.rmtree(path, ignore_errors=True)
+
+    return results
+
+
+def tune_collection(
+    collection_name: str = "courses",
+    persist_directory: Optional[str] = "./chroma_db",
+    use_server: bool = False,
+    server_host: str = "localhost",
+    server_port: int = 8000,
+    grid: Optional[Dict[str, List[Any]]] = None,
+    k: int = 10,
+    num_queries: int = 100
+) -> List[Dict[str, Any]]:
+    """
+    Run the HNSW sweep on the vectors stored in an existing collection.
+
+    Args:
+        collection_name: Collection to read vectors from (default: "courses")
+        persist_directory: Directory of the local ChromaDB (used when use_server=False)
+        use_server: If True, read vectors from the ChromaDB server (default: False)
+        server_host: ChromaDB server host (default: "localhost")
+        server_port: ChromaDB server port (default: 8000)
+        grid: Mapping of hnsw_metadata argument name to candidate values
+        k: Number of neighbors for recall@k (default: 10)
+        num_queries: Number of stored vectors sampled as queries (default: 100)
+
+    Returns:
+        Sweep results (see run_sweep)
+    """
+    client = get_chroma_client(
+        persist_directory=persist_directory,
+        use_server=use_server,
+        server_host=server_host,
+        server_port=server_port
+    )
+    collection = client.get_collection(name=collection_name)
+    ids, vectors, _ = load_course_matrix(collection, normalize=False)
+    if not ids:
+        print(f"Collection '{collection_name}' is empty")
+        return []
+
+    print(f"Tuning HNSW on {len(ids)} vector(s) from '{collection_name}'")
+    print("=" * 60)
+    return run_sweep(ids, vectors, grid=grid, k=k, num_queries=num_queries)
+
+
+def print_report(results: List[Dict[str, Any]]) -> None:
+    """Print sweep results as a table, best recall first then lowest p99."""
+    if not results:
+        print("No results")
+        return
+
+    setting_keys = [key for key in results[0] if key not in ("recall", "p50_ms", "p99_ms", "build_s")]
+    header = setting_keys + ["recall", "p50_ms", "p99_ms", "build_s"]
+    print(" | ".join(f"{h:>15}" for h in header))
+    print("-" * (18 * len(header)))
+    for result in sorted(results, key=lambda r: (-r["recall"], r["p99_ms"])):
+        row = [str(result[key]) for key in setting_keys]
+        row += [f"{result['recall']:.4f}", f"{result['p50_ms']:.2f}", f"{result['p99_ms']:.2f}", f"{result['build_s']:.2f}"]
+        print(" | ".join(f"{cell:>15}" for cell in row))
+
+
+if __name__ == "__main__":
+    import sys
+
+    # 사용 예시:
+    #   python hnsw_tuning.py           # 로컬 ./chroma_db의 courses 컬렉션
+    #   python hnsw_tuning.py server    # localhost:8000 서버의 courses 컬렉션
+    use_server = len(sys.argv) > 1 and sys.argv[1] == "server"
+    results = tune_collection(use_server=use_server)
+    print("\n" + "=" * 60)
+    print_report(results)
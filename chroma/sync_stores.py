@@ -0,0 +1,281 @@
+"""
+Diff-based sync between the local PersistentClient store (./chroma_db) and
+the ChromaDB server (localhost:8000).
+
+Both sides are paged by ID with metadata only and compared with per-record
+hashes. Only missing, changed or deleted records are transferred, so keeping
+a replica current costs the diff rather than a full re-embed or copy.
+
+Record hash:
+    sha256 of the canonical metadata JSON. Metadata written by embeddocument.py
+    carries a content_hash of the document; for records without one the
+    document text is fetched and hashed as well. Records written by
+    embeddocument.py and watch_ingest.py also carry the embedding_model, so a
+    re-embed with another model changes the hash.
+
+Embedding model:
+    Vectors themselves are never hashed. If the collections' embedding_model
+    metadata differs, every record is treated as changed, and the sync is
+    refused unless allow_model_change (--allow-model-change) is set. The
+    target's embedding_model is updated after the sync.
+
+Usage:
+    python sync_stores.py pull [--dry-run] [--keep-deleted] [--allow-model-change]   # server → local
+    python sync_stores.py push [--dry-run] [--keep-deleted] [--allow-model-change]   # local → server
+"""
+import json
+from typing import Any, Dict, List, Optional
+
+from corpus import text_hash
+from vectordb import get_chroma_client
+
+
+def _record_hash(metadata: Optional[Dict[str, Any]], document: Optional[str] = None) -> str:
+    """Hash a record from its metadata and, if given, its document text."""
+    payload = json.dumps(metadata or {}, sort_keys=True, ensure_ascii=False)
+    if document is not None:
+        payload += "\n" + document
+    return text_hash(payload)
+
+
+def index_collection(collection, page_size: int = 500) -> Dict[str, str]:
+    """
+    Page through a collection and hash every record.
+    Embeddings are never fetched; documents only for records without content_hash.
+
+    Args:
+        collection: ChromaDB collection
+        page_size: Number of records fetched per collection.get call
+
+    Returns:
+        Dictionary mapping record ID to record hash
+    """
+    hashes: Dict[str, str] = {}
+    offset = 0
+    while True:
+        page = collection.get(limit=page_size, offset=offset, include=['metadatas'])
+        if not page['ids']:
+            break
+
+        metadatas = page['metadatas'] or [{}] * len(page['ids'])
+        without_hash = []
+        for record_id, metadata in zip(page['ids'], metadatas):
+            if metadata and 'content_hash' in metadata:
+                hashes[record_id] = _record_hash(metadata)
+            else:
+                without_hash.append(record_id)
+
+        if without_hash:
+            # Older records: fall back to hashing the document text
+            documents = collection.get(ids=without_hash, include=['metadatas', 'documents'])
+            for i, record_id in enumerate(documents['ids']):
+                metadata = documents['metadatas'][i] if documents['metadatas'] else {}
+                document = documents['documents'][i] if documents['documents'] else ''
+                hashes[record_id] = _record_hash(metadata, document or '')
+
+        offset += len(page['ids'])
+    return hashes
+
+
+def diff_collections(
+    source_hashes: Dict[str, str],
+    target_hashes: Dict[str, str]
+) -> Dict[str, List[str]]:
+    """
+    Compare two record hash indexes.
+
+    Returns:
+        Dictionary containing:
+            - 'missing': IDs only in the source
+            - 'changed': IDs in both with different hashes
+            - 'deleted': IDs only in the target
+    """
+    return {
+        'missing': sorted(source_hashes.keys() - target_hashes.keys()),
+        'changed': sorted(
+            record_id for record_id in source_hashes.keys() & target_hashes.keys()
+            if source_hashes[record_id] != target_hashes[record_id]
+        ),
+        'deleted': sorted(target_hashes.keys() - source_hashes.keys())
+    }
+
+
+def sync_collections(
+    source,
+    target,
+    dry_run: bool = False,
+    delete: bool = True,
+    batch_size: int = 100,
+    page_size: int = 500,
+    allow_model_change: bool = False
+) -> Dict[str, Any]:
+    """
+    Make the target collection match the source collection.
+
+    Args:
+        source: Source ChromaDB collection
+        target: Target ChromaDB collection
+        dry_run: If True, only compute and print the diff (default: False)
+        delete: If True, delete target records missing from the source (default: True)
+        batch_size: Number of records transferred per get/add/delete call
+        page_size: Number of records per page when indexing
+        allow_model_change: If True, sync even when the collections'
+            embedding_model differs, replacing every record (default: False)
+
+    Returns:
+        Summary dictionary with 'source_count', 'target_count', 'missing',
+        'changed', 'deleted' (counts) and 'dry_run'
+    """
+    source_model = (source.metadata or {}).get('embedding_model')
+    target_model = (target.metadata or {}).get('embedding_model')
+    model_changed = bool(source_model and target_model and source_model != target_model)
+    if model_changed:
+        print(f"Warning: Embedding model differs (source: {source_model}, target: {target_model}); "
+              f"every record is treated as changed")
+        if not allow_model_change and not dry_run:
+            raise ValueError(
+                f"Embedding model differs (source: {source_model}, target: {target_model}); "
+                f"pass allow_model_change=True (--allow-model-change) to replace every record"
+            )
+
+    source_hashes = index_collection(source, page_size=page_size)
+    target_hashes = index_collection(target, page_size=page_size)
+    diff = diff_collections(source_hashes, target_hashes)
+    if model_changed:
+        # Vectors from different models are not comparable, whatever the metadata says
+        diff['changed'] = sorted(source_hashes.keys() & target_hashes.keys())
+
+    summary = {
+        'source_count': len(source_hashes),
+        'target_count': len(target_hashes),
+        'missing': len(diff['missing']),
+        'changed': len(diff['changed']),
+        'deleted': len(diff['deleted']) if delete else 0,
+        'dry_run': dry_run
+    }
+
+    print(f"Source: {summary['source_count']} record(s), target: {summary['target_count']} record(s)")
+    print(f"  - Missing in target: {summary['missing']}")
+    print(f"  - Changed: {summary['changed']}")
+    print(f"  - Deleted from source: {len(diff['deleted'])}{'' if delete else ' (kept)'}")
+
+    if dry_run:
+        return summary
+
+    to_push = diff['missing'] + diff['changed']
+    changed = set(diff['changed'])
+    for offset in range(0, len(to_push), batch_size):
+        batch_ids = to_push[offset:offset + batch_size]
+        records = source.get(ids=batch_ids, include=['embeddings', 'documents', 'metadatas'])
+        # upsert merges metadata, so keys dropped in the source would survive
+        # on the target; replace changed records with delete + add instead
+        stale_ids = [record_id for record_id in batch_ids if record_id in changed]
+        if stale_ids:
+            target.delete(ids=stale_ids)
+        target.add(
+            ids=records['ids'],
+            embeddings=records['embeddings'],
+            documents=records['documents'],
+            metadatas=records['metadatas']
+        )
+        print(f"  Pushed {offset + len(batch_ids)}/{len(to_push)} record(s)")
+
+    if delete:
+        for offset in range(0, len(diff['deleted']), batch_size):
+            target.delete(ids=diff['deleted'][offset:offset + batch_size])
+
+    if source_model and source_model != target_model:
+        # modify() replaces the metadata and rejects hnsw:* keys (HNSW settings
+        # are fixed at creation), so only the remaining keys are carried over
+        metadata = {
+            key: value for key, value in (target.metadata or {}).items()
+            if not key.startswith("hnsw:")
+        }
+        metadata['embedding_model'] = source_model
+        target.modify(metadata=metadata)
+        print(f"  Updated target embedding_model: {target_model} → {source_model}")
+
+    return summary
+
+
+def sync_stores(
+    direction: str = "pull",
+    collection_name: str = "courses",
+    persist_directory: str = "./chroma_db",
+    server_host: str = "localhost",
+    server_port: int = 8000,
+    dry_run: bool = False,
+    delete: bool = True,
+    batch_size: int = 100,
+    allow_model_change: bool = False
+) -> Dict[str, Any]:
+    """
+    Sync a collection between the local PersistentClient and the ChromaDB server.
+
+    Args:
+        direction: "pull" (server → local) or "push" (local → server)
+        collection_name: Collection to sync (default: "courses")
+        persist_directory: Local ChromaDB directory (default: "./chroma_db")
+        server_host: ChromaDB server host (default: "localhost")
+        server_port: ChromaDB server port (default: 8000)
+        dry_run: If True, only print the diff summary (default: False)
+        delete: If True, delete target records missing from the source (default: True)
+        batch_size: Number of records transferred per call (default: 100)
+        allow_model_change: If True, sync even when the embedding model differs (default: False)
+
+    Returns:
+        Summary dictionary (see sync_collections)
+    """
+    if direction not in ("pull", "push"):
+        raise ValueError(f"Unknown direction '{direction}', expected 'pull' or 'push'")
+
+    local_client = get_chroma_client(persist_directory=persist_directory)
+    server_client = get_chroma_client(use_server=True, server_host=server_host, server_port=server_port)
+    source_client, target_client = (
+        (server_client, local_client) if direction == "pull" else (local_client, server_client)
+    )
+
+    source = source_client.get_collection(name=collection_name)
+    if dry_run:
+        try:
+            target = target_client.get_collection(name=collection_name)
+        except Exception:
+            source_count = len(index_collection(source))
+            print(f"Target collection '{collection_name}' does not exist; all {source_count} record(s) would be pushed")
+            return {'source_count': source_count, 'target_count': 0, 'missing': source_count,
+                    'changed': 0, 'deleted': 0, 'dry_run': True}
+    else:
+        # New collections inherit the source metadata (HNSW settings, embedding model)
+        target = target_client.get_or_create_collection(
+            name=collection_name,
+            metadata=source.metadata or None
+        )
+
+    print(f"Syncing '{collection_name}' ({direction}): "
+          f"{'server → local' if direction == 'pull' else 'local → server'}")
+    print("=" * 60)
+    return sync_collections(
+        source, target, dry_run=dry_run, delete=delete, batch_size=batch_size,
+        allow_model_change=allow_model_change
+    )
+
+
+if __name__ == "__main__":
+    import sys
+
+    args = sys.argv[1:]
+    direction = args[0] if args and not args[0].startswith("--") else "pull"
+
+    try:
+        summary = sync_stores(
+            direction=direction,
+            dry_run="--dry-run" in args,
+            delete="--keep-deleted" not in args,
+            allow_model_change="--allow-model-change" in args
+        )
+        print("\n" + "=" * 60)
+        print(f"✅ Sync {'dry run ' if summary['dry_run'] else ''}complete: {summary}")
+    except Exception as e:
+        print(f"❌ Error syncing stores: {e}")
+        import traceback
+        traceback.print_exc()
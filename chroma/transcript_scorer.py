@@ -0,0 +1,239 @@
+"""
+Transcript → Recommendation batch scorer.
+Uses the embeddings already stored in the "courses" collection (keyed by
+course_id) instead of embedding a text query per transcript course.
+
+Flow:
+    1. Fetch stored vectors for all taken course IDs with one collection.get(ids=...)
+    2. Build a grade-weighted profile vector
+    3. Score every untaken course in one vectorized similarity pass
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from vectordb import get_chroma_client
+
+
+# Same weights as RecommendService.getGradeWeight in the backend
+GRADE_WEIGHTS: Dict[str, float] = {
+    "A_PLUS": 1.0,
+    "A": 0.9,
+    "B_PLUS": 0.8,
+    "B": 0.7,
+    "C_PLUS": 0.6,
+    "C": 0.5,
+    "D_PLUS": 0.4,
+    "D": 0.3,
+    "F": 0.1,
+    "P": 0.5,
+}
+DEFAULT_GRADE_WEIGHT = 0.5
+
+
+def grade_weight(grade: Optional[str]) -> float:
+    """
+    Convert a grade to a weight.
+    Accepts both the Prisma enum form ("A_PLUS") and the transcript form ("A+").
+
+    Args:
+        grade: Grade string (None or unknown grades get DEFAULT_GRADE_WEIGHT)
+
+    Returns:
+        Weight between 0.0 and 1.0
+    """
+    if not grade:
+        return DEFAULT_GRADE_WEIGHT
+    key = grade.strip().upper().replace("+", "_PLUS")
+    return GRADE_WEIGHTS.get(key, DEFAULT_GRADE_WEIGHT)
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize each row, leaving zero rows as zero."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def load_course_matrix(
+    collection,
+    batch_size: int = 1000,
+    normalize: bool = True
+) -> Tuple[List[str], np.ndarray, List[Dict[str, Any]]]:
+    """
+    Load every stored course vector from a collection into one matrix.
+
+    Args:
+        collection: ChromaDB collection
+        batch_size: Number of records fetched per collection.get call
+        normalize: If True, L2-normalize each row (default: True)
+
+    Returns:
+        Tuple of (ids, float32 matrix, metadatas)
+    """
+    ids: List[str] = []
+    vectors: List[Any] = []
+    metadatas: List[Dict[str, Any]] = []
+
+    offset = 0
+    while True:
+        batch = collection.get(
+            limit=batch_size,
+            offset=offset,
+            include=['embeddings', 'metadatas']
+        )
+        if not batch['ids']:
+            break
+        ids.extend(batch['ids'])
+        vectors.extend(batch['embeddings'])
+        metadatas.extend(batch['metadatas'] or [{}] * len(batch['ids']))
+        offset += len(batch['ids'])
+
+    if not ids:
+        return [], np.zeros((0, 0), dtype=np.float32), []
+
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if normalize:
+        matrix = _normalize_rows(matrix)
+    return ids, matrix, metadatas
+
+
+def build_profile_vector(
+    collection,
+    taken_courses: Dict[str, Optional[str]]
+) -> Tuple[Optional[np.ndarray], List[str]]:
+    """
+    Build a grade-weighted profile vector from stored course vectors.
+
+    Args:
+        collection: ChromaDB collection keyed by course_id
+        taken_courses: Mapping of course_id to grade (e.g. {"COSE10102": "A+"})
+
+    Returns:
+        Tuple of (unit-length profile vector or None, course IDs not found in the collection)
+    """
+    taken_ids = list(taken_courses.keys())
+    if not taken_ids:
+        return None, []
+
+    # Single batched fetch for every taken course
+    results = collection.get(ids=taken_ids, include=['embeddings'])
+    found_ids = results['ids'] or []
+    found = set(found_ids)
+    missing_ids = [course_id for course_id in taken_ids if course_id not in found]
+
+    if not found_ids:
+        return None, missing_ids
+
+    vectors = _normalize_rows(np.asarray(results['embeddings'], dtype=np.float32))
+    weights = np.asarray([grade_weight(taken_courses[course_id]) for course_id in found_ids], dtype=np.float32)
+
+    profile = weights @ vectors
+    norm = np.linalg.norm(profile)
+    if norm == 0:
+        return None, missing_ids
+    return profile / norm, missing_ids
+
+
+def score_transcript(
+    taken_courses: Dict[str, Optional[str]],
+    top_k: int = 10,
+    collection_name: str = "courses",
+    persist_directory: Optional[str] = "./chroma_db",
+    use_server: bool = False,
+    server_host: str = "localhost",
+    server_port: int = 8000,
+    course_matrix: Optional[Tuple[List[str], np.ndarray, List[Dict[str, Any]]]] = None
+) -> Dict[str, Any]:
+    """
+    Recommend untaken courses similar to a student's transcript.
+    No embedding API calls are made for courses already in the collection.
+
+    Args:
+        taken_courses: Mapping of taken course_id to grade (e.g. {"COSE10102": "A+"})
+        top_k: Number of recommendations to return (default: 10)
+        collection_name: Name of the collection holding course vectors
+        persist_directory: Directory of the local ChromaDB (used when use_server=False)
+        use_server: If True, use HTTP client to connect to ChromaDB server (default: False)
+        server_host: ChromaDB server host (default: "localhost")
+        server_port: ChromaDB server port (default: 8000)
+        course_matrix: Optional preloaded output of load_course_matrix, to reuse
+            across many transcripts
+
+    Returns:
+        Dictionary containing:
+            - 'recommendations': List of {'id', 'metadata', 'similarity'} sorted by similarity
+            - 'missing_ids': Taken course IDs with no stored vector (callers may
+              fall back to a text query for these)
+
+    Example:
+        >>> result = score_transcript({"COSE10102": "A+", "COSE21300": "B"}, top_k=5)
+        >>> for rec in result['recommendations']:
+        ...     print(rec['id'], rec['similarity'])
+    """
+    client = get_chroma_client(
+        persist_directory=persist_directory,
+        use_server=use_server,
+        server_host=server_host,
+        server_port=server_port
+    )
+    collection = client.get_collection(name=collection_name)
+
+    profile, missing_ids = build_profile_vector(collection, taken_courses)
+    if missing_ids:
+        print(f"Warning: No stored vector for {len(missing_ids)} course(s): {missing_ids}")
+    if profile is None:
+        return {'recommendations': [], 'missing_ids': missing_ids}
+
+    ids, matrix, metadatas = course_matrix if course_matrix is not None else load_course_matrix(collection)
+    if not ids:
+        return {'recommendations': [], 'missing_ids': missing_ids}
+
+    # One similarity pass over every stored course (cosine, rows are unit length)
+    scores = matrix @ profile
+
+    # Exclude courses the student has already taken
+    taken = set(taken_courses.keys())
+    candidate_mask = np.fromiter((course_id not in taken for course_id in ids), dtype=bool, count=len(ids))
+    scores = np.where(candidate_mask, scores, -np.inf)
+
+    k = min(top_k, int(candidate_mask.sum()))
+    if k <= 0:
+        return {'recommendations': [], 'missing_ids': missing_ids}
+
+    top_idx = np.argpartition(-scores, k - 1)[:k]
+    top_idx = top_idx[np.argsort(-scores[top_idx])]
+
+    recommendations = [
+        {
+            'id': ids[i],
+            'metadata': metadatas[i] if metadatas else {},
+            'similarity': float(scores[i])
+        }
+        for i in top_idx
+    ]
+    return {'recommendations': recommendations, 'missing_ids': missing_ids}
+
+
+if __name__ == "__main__":
+    import sys
+
+    # 사용 예시: python transcript_scorer.py COSE10102:A+ COSE21300:B
+    if len(sys.argv) > 1:
+        taken = {}
+        for arg in sys.argv[1:]:
+            course_id, _, grade = arg.partition(":")
+            taken[course_id] = grade or None
+    else:
+        taken = {"COSE10102": "A+"}
+
+    result = score_transcript(taken, top_k=5)
+
+    print(f"Found {len(result['recommendations'])} recommendations:")
+    for i, rec in enumerate(result['recommendations'], 1):
+        print(f"\n--- Recommendation {i} ---")
+        print(f"ID: {rec['id']}")
+        print(f"Course Name: {rec['metadata'].get('course_name', '')}")
+        print(f"Similarity: {rec['similarity']:.4f}")
+    if result['missing_ids']:
+        print(f"\nMissing course IDs: {result['missing_ids']}")
@@ -3,13 +3,77 @@ RAG Pipeline - Step 2: VectorDB Search
 Performs similarity search to find top-k relevant documents from vector database.
 """
 
-from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple, Union
 import os
 import chromadb
 from chromadb.config import Settings
 import chromadb.utils.embedding_functions as embedding_functions
 
 
+DISTANCE_METRICS = ("l2", "cosine", "ip")
+
+
+def get_chroma_client(
+    persist_directory: Optional[str] = None,
+    use_server: bool = False,
+    server_host: str = "localhost",
+    server_port: int = 8000
+):
+    """
+    Create a ChromaDB client for the server, a local directory or memory.
+    
+    Args:
+        persist_directory: Directory to persist the database (used when use_server=False)
+        use_server: If True, use HTTP client to connect to ChromaDB server (default: False)
+        server_host: ChromaDB server host (default: "localhost")
+        server_port: ChromaDB server port (default: 8000)
+    
+    Returns:
+        ChromaDB client
+    """
+    if use_server:
+        # HTTP 서버 모드 (Docker 컨테이너 사용)
+        return chromadb.HttpClient(host=server_host, port=server_port)
+    elif persist_directory:
+        # 로컬 파일 시스템 모드 (기존 방식)
+        return chromadb.PersistentClient(path=persist_directory)
+    else:
+        # 인메모리 모드
+        return chromadb.Client(Settings(anonymized_telemetry=False))
+
+
+def hnsw_metadata(
+    distance_metric: Optional[str] = None,
+    m: Optional[int] = None,
+    construction_ef: Optional[int] = None,
+    search_ef: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Build ChromaDB collection metadata for HNSW index settings.
+    Settings left as None are omitted so Chroma's defaults apply.
+    
+    Args:
+        distance_metric: "l2", "cosine" or "ip"
+        m: Max neighbors per node (hnsw:M)
+        construction_ef: Candidate list size at build time (hnsw:construction_ef)
+        search_ef: Candidate list size at query time (hnsw:search_ef)
+    
+    Returns:
+        Metadata dictionary to pass to create_collection / get_or_create_collection
+    """
+    if distance_metric is not None and distance_metric not in DISTANCE_METRICS:
+        raise ValueError(f"Unknown distance metric '{distance_metric}', expected one of {DISTANCE_METRICS}")
+    
+    settings = {
+        "hnsw:space": distance_metric,
+        "hnsw:M": m,
+        "hnsw:construction_ef": construction_ef,
+        "hnsw:search_ef": search_ef
+    }
+    return {key: value for key, value in settings.items() if value is not None}
+
+
 def search_vectordb(
     query_vector: List[float],
     collection_name: str = "documents",
@@ -42,10 +106,7 @@ def search_vectordb(
         ...     print(result['metadata'])
     """
     # Initialize ChromaDB client
-    if persist_directory:
-        client = chromadb.PersistentClient(path=persist_directory)
-    else:
-        client = chromadb.Client(Settings(anonymized_telemetry=False))
+    client = get_chroma_client(persist_directory=persist_directory)
     
     # Get or create collection
     collection = client.get_or_create_collection(name=collection_name)
@@ -57,7 +118,11 @@ def search_vectordb(
         include=['metadatas', 'documents', 'distances']
     )
     
-    # Format results
+    return _format_query_results(results)
+
+
+def _format_query_results(results: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Flatten a single-query collection.query response into a list of result dicts."""
     formatted_results = []
     if results['ids'] and len(results['ids'][0]) > 0:
         for i in range(len(results['ids'][0])):
@@ -71,6 +136,146 @@ def search_vectordb(
     return formatted_results
 
 
+def _collection_space(collection) -> str:
+    """Distance metric of a collection, falling back to Chroma's default "l2"."""
+    space = (collection.metadata or {}).get("hnsw:space")
+    if not space:
+        try:
+            space = (collection.configuration or {}).get("hnsw", {}).get("space")
+        except Exception:
+            # Older clients have no configuration attribute
+            space = None
+    return space or "l2"
+
+
+def distance_to_similarity(distance: float, space: str = "l2") -> float:
+    """
+    Convert a Chroma distance into a similarity (higher is more similar).
+    
+    Args:
+        distance: Distance returned by collection.query
+        space: Distance metric of the collection ("l2", "cosine" or "ip")
+    
+    Returns:
+        1 - d for cosine (cosine similarity) and ip (inner product),
+        1 / (1 + d) for l2 (squared L2 distance)
+    """
+    if space in ("cosine", "ip"):
+        return 1.0 - distance
+    return 1.0 / (1.0 + max(distance, 0.0))
+
+
+def _result_course_id(result: Dict[str, Any]) -> str:
+    """metadata course_id of a formatted result, falling back to the document ID."""
+    return (result['metadata'] or {}).get('course_id', result['id'])
+
+
+def search_collections(
+    query_vector: List[float],
+    collections: Union[List[str], Dict[str, float]],
+    top_k: int = 5,
+    persist_directory: Optional[str] = None,
+    use_server: bool = False,
+    server_host: str = "localhost",
+    server_port: int = 8000,
+    max_workers: Optional[int] = None,
+    overfetch: int = 3
+) -> List[Dict[str, Any]]:
+    """
+    Fan-out search across several collections and merge into one top-k by course_id.
+    Collections are queried concurrently from a thread pool, so total latency
+    is close to the slowest single collection rather than the sum.
+    
+    Each collection's distances are converted to a similarity using that
+    collection's distance metric (hnsw:space) before weighting, so scores stay
+    absolute: a weak best match in one collection does not tie a strong match
+    in another (see distance_to_similarity). Similarities are clamped at 0
+    before weighting (cosine/ip can go negative), so weights only scale
+    non-negative scores.
+    
+    Collections may hold several chunks per course, so each collection is
+    asked for top_k * overfetch results (capped at its size) and re-queried
+    with a larger n_results until it yields top_k distinct course_ids.
+    
+    Args:
+        query_vector: The embedding vector from the query (from Step 1)
+        collections: Collection names, or a mapping of collection name to weight
+            (e.g. {"reviews": 1.0, "syllabi": 0.7}); a list gives every collection weight 1.0
+        top_k: Number of merged results to return (default: 5)
+        persist_directory: Directory to persist the database (used when use_server=False)
+        use_server: If True, use HTTP client to connect to ChromaDB server (default: False)
+        server_host: ChromaDB server host (default: "localhost")
+        server_port: ChromaDB server port (default: 8000)
+        max_workers: Thread pool size (default: one thread per collection)
+        overfetch: Initial n_results multiplier per collection (default: 3)
+    
+    Returns:
+        List of dictionaries sorted by 'score' (higher is more similar), one per course_id:
+            - 'id', 'text', 'metadata', 'distance': As in search_vectordb, from the best-scoring collection
+            - 'course_id': metadata course_id, falling back to the document ID
+            - 'collection': Collection the best match came from
+            - 'score': Weighted similarity
+    
+    Example:
+        >>> results = search_collections(query_vector, {"reviews": 1.0, "syllabi": 0.5}, top_k=5)
+        >>> for result in results:
+        ...     print(result['course_id'], result['collection'], result['score'])
+    """
+    weights = collections if isinstance(collections, dict) else {name: 1.0 for name in collections}
+    if not weights:
+        return []
+    
+    client = get_chroma_client(
+        persist_directory=persist_directory,
+        use_server=use_server,
+        server_host=server_host,
+        server_port=server_port
+    )
+    
+    def query_one(collection_name: str) -> Tuple[List[Dict[str, Any]], str]:
+        try:
+            collection = client.get_collection(name=collection_name)
+            count = collection.count()
+            n_results = top_k * max(overfetch, 1)
+            while True:
+                results = _format_query_results(collection.query(
+                    query_embeddings=[query_vector],
+                    n_results=min(n_results, count),
+                    include=['metadatas', 'documents', 'distances']
+                )) if count else []
+                course_ids = {_result_course_id(result) for result in results}
+                if len(course_ids) >= top_k or n_results >= count:
+                    break
+                n_results *= 2
+        except Exception as e:
+            print(f"Warning: Search failed for collection '{collection_name}': {e}")
+            return [], "l2"
+        return results, _collection_space(collection)
+    
+    with ThreadPoolExecutor(max_workers=max_workers or len(weights)) as executor:
+        futures = {name: executor.submit(query_one, name) for name in weights}
+        per_collection = {name: future.result() for name, future in futures.items()}
+    
+    merged: Dict[str, Dict[str, Any]] = {}
+    for collection_name, (results, space) in per_collection.items():
+        for result in results:
+            if result['distance'] is None:
+                continue
+            similarity = max(distance_to_similarity(result['distance'], space), 0.0)
+            score = weights[collection_name] * similarity
+            course_id = _result_course_id(result)
+            
+            if course_id not in merged or score > merged[course_id]['score']:
+                merged[course_id] = {
+                    **result,
+                    'course_id': course_id,
+                    'collection': collection_name,
+                    'score': score
+                }
+    
+    return sorted(merged.values(), key=lambda result: result['score'], reverse=True)[:top_k]
+
+
 def add_documents_to_vectordb(
     texts: List[str],
     embeddings: List[List[float]],
@@ -82,7 +287,12 @@ def add_documents_to_vectordb(
     embedding_model: str = "text-embedding-ada-002",
     use_server: bool = False,
     server_host: str = "localhost",
-    server_port: int = 8000
+    server_port: int = 8000,
+    distance_metric: Optional[str] = None,
+    hnsw_m: Optional[int] = None,
+    hnsw_construction_ef: Optional[int] = None,
+    hnsw_search_ef: Optional[int] = None,
+    upsert: bool = False
 ) -> None:
     """
     Add documents to the vector database.
@@ -99,17 +309,22 @@ def add_documents_to_vectordb(
         use_server: If True, use HTTP client to connect to ChromaDB server (default: False)
         server_host: ChromaDB server host (default: "localhost")
         server_port: ChromaDB server port (default: 8000)
+        distance_metric: HNSW distance metric "l2", "cosine" or "ip" (default: Chroma's "l2")
+        hnsw_m: HNSW max neighbors per node (default: Chroma's default)
+        hnsw_construction_ef: HNSW candidate list size at build time (default: Chroma's default)
+        hnsw_search_ef: HNSW candidate list size at query time (default: Chroma's default)
+        upsert: If True, update documents whose IDs already exist instead of skipping them
+    
+    The HNSW settings only apply when the collection is created; they are
+    recorded in the collection metadata together with the embedding model.
     """
     # ChromaDB 클라이언트 초기화
-    if use_server:
-        # HTTP 서버 모드 (Docker 컨테이너 사용)
-        client = chromadb.HttpClient(host=server_host, port=server_port)
-    elif persist_directory:
-        # 로컬 파일 시스템 모드 (기존 방식)
-        client = chromadb.PersistentClient(path=persist_directory)
-    else:
-        # 인메모리 모드
-        client = chromadb.Client(Settings(anonymized_telemetry=False))
+    client = get_chroma_client(
+        persist_directory=persist_directory,
+        use_server=use_server,
+        server_host=server_host,
+        server_port=server_port
+    )
     
     # Delete existing collection if clear_existing is True
     if clear_existing:
@@ -130,15 +345,27 @@ def add_documents_to_vectordb(
         model_name=embedding_model
     )
     
-    # Get or create collection
-    collection = client.get_or_create_collection(name=collection_name, embedding_function=openai_ef)
+    # Get or create collection (HNSW settings are fixed at creation time)
+    collection_metadata = hnsw_metadata(
+        distance_metric=distance_metric,
+        m=hnsw_m,
+        construction_ef=hnsw_construction_ef,
+        search_ef=hnsw_search_ef
+    )
+    collection_metadata["embedding_model"] = embedding_model
+    collection = client.get_or_create_collection(
+        name=collection_name,
+        embedding_function=openai_ef,
+        metadata=collection_metadata
+    )
     
     # Generate IDs if not provided
     if ids is None:
         ids = [f"doc_{i}" for i in range(len(texts))]
     
-    # Add documents (will update if IDs already exist, unless collection was cleared)
-    collection.add(
+    # Add documents (upsert replaces existing IDs, add leaves them untouched)
+    write = collection.upsert if upsert else collection.add
+    write(
         embeddings=embeddings,
         documents=texts,
         metadatas=metadatas if metadatas else [{}] * len(texts),
@@ -146,6 +373,44 @@ def add_documents_to_vectordb(
     )
 
 
+def delete_documents_from_vectordb(
+    ids: List[str],
+    collection_name: str = "documents",
+    persist_directory: Optional[str] = None,
+    use_server: bool = False,
+    server_host: str = "localhost",
+    server_port: int = 8000
+) -> None:
+    """
+    Delete documents from the vector database by ID.
+    
+    Args:
+        ids: List of document IDs to delete
+        collection_name: Name of the ChromaDB collection
+        persist_directory: Directory to persist the database (used when use_server=False)
+        use_server: If True, use HTTP client to connect to ChromaDB server (default: False)
+        server_host: ChromaDB server host (default: "localhost")
+        server_port: ChromaDB server port (default: 8000)
+    """
+    if not ids:
+        return
+    
+    client = get_chroma_client(
+        persist_directory=persist_directory,
+        use_server=use_server,
+        server_host=server_host,
+        server_port=server_port
+    )
+    
+    try:
+        collection = client.get_collection(name=collection_name)
+    except Exception:
+        # Collection doesn't exist, nothing to delete
+        return
+    
+    collection.delete(ids=ids)
+
+
 if __name__ == "__main__":
     # Example usage
     from embeddings import embedding
@@ -0,0 +1,418 @@
+"""
+Continuous watch-mode ingestion for the document folder.
+Watches document/<course_id>/ for file changes (inotify via watchdog, or
+polling when watchdog is not installed), debounces bursts of events per
+course folder, and re-extracts, re-embeds and upserts only the affected
+courses. Changes from many courses are coalesced into batched embedding
+and ChromaDB write calls.
+
+Usage:
+    python watch_ingest.py                # watch ./document
+    python watch_ingest.py --poll         # force polling
+    python watch_ingest.py --knn-index    # also update ./knn_index after each batch
+"""
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from corpus import (
+    DEFAULT_CORPUS_PATH,
+    group_records,
+    iter_course_groups,
+    replace_course_records
+)
+from course_knn import DEFAULT_INDEX_DIR, knn_update_hook
+from embeddings import embedding_batch
+from embeddocument import build_course_documents, extract_course_records
+from vectordb import add_documents_to_vectordb, delete_documents_from_vectordb
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+    WATCHDOG_AVAILABLE = True
+except ImportError:
+    FileSystemEventHandler = object
+    Observer = None
+    WATCHDOG_AVAILABLE = False
+
+
+def _course_signature(course: Dict[str, Any]) -> FrozenSet[Tuple[str, str]]:
+    """(source, hash) pairs of a grouped course, used to skip no-op re-embeds."""
+    records = ([course["profile"]] if course["profile"] else []) + course["reviews"] + course["syllabi"]
+    return frozenset((record["source"], record["hash"]) for record in records)
+
+
+class _EventHandler(FileSystemEventHandler):
+    """
+    Forward content-changing watchdog events to the watcher.
+    Only created/modified/deleted/moved are handled: opened and closed events
+    fire when the watcher itself reads the files, which would requeue every
+    processed course forever.
+    """
+
+    def __init__(self, watcher: "DocumentWatcher"):
+        super().__init__()
+        self.watcher = watcher
+
+    def on_created(self, event):
+        self.watcher.notify(event.src_path)
+
+    def on_modified(self, event):
+        # A directory's mtime changes with its entries, which already have their own events
+        if not event.is_directory:
+            self.watcher.notify(event.src_path)
+
+    def on_deleted(self, event):
+        self.watcher.notify(event.src_path)
+
+    def on_moved(self, event):
+        self.watcher.notify(event.src_path)
+        self.watcher.notify(event.dest_path)
+
+
+class DocumentWatcher:
+    """
+    Long-running watcher that keeps the "courses" collection in sync with
+    the document folder.
+
+    Args:
+        document_folder: Path to the document folder (default: "document")
+        corpus_path: Path of the corpus artifact kept up to date (default: "corpus.jsonl")
+        model: The embedding model to use (default: "text-embedding-ada-002")
+        collection_name: Collection to upsert into (default: "courses")
+        persist_directory: Directory to persist ChromaDB (used when use_server=False)
+        use_server: If True, write to the ChromaDB server (default: True, as embeddocument.py)
+        server_host: ChromaDB server host (default: "localhost")
+        server_port: ChromaDB server port (default: 8000)
+        debounce_seconds: Quiet time after the last event before a course is processed
+        max_batch: Maximum number of courses per embedding/write batch
+        poll_interval: Seconds between scans in polling mode, and the worker tick
+        force_polling: If True, poll even when watchdog is available
+        on_batch: Optional callback called with the list of upserted/deleted
+            course IDs after each batch
+        knn_index_dir: If set (and on_batch is not), the k-NN index in this
+            directory is updated with each batch's changed IDs, reading vectors
+            from the same ChromaDB as the watcher writes to
+
+    Example:
+        >>> watcher = DocumentWatcher("document")
+        >>> watcher.run()  # Ctrl+C to stop
+    """
+
+    def __init__(
+        self,
+        document_folder: str = "document",
+        corpus_path: str = DEFAULT_CORPUS_PATH,
+        model: str = "text-embedding-ada-002",
+        collection_name: str = "courses",
+        persist_directory: Optional[str] = "./chroma_db",
+        use_server: bool = True,
+        server_host: str = "localhost",
+        server_port: int = 8000,
+        debounce_seconds: float = 2.0,
+        max_batch: int = 32,
+        poll_interval: float = 1.0,
+        force_polling: bool = False,
+        on_batch: Optional[Callable[[List[str]], Any]] = None,
+        knn_index_dir: Optional[str] = None
+    ):
+        self.document_root = Path(document_folder).resolve()
+        if not self.document_root.is_dir():
+            raise NotADirectoryError(f"'{document_folder}' is not a directory")
+
+        self.corpus_path = corpus_path
+        self.model = model
+        self.collection_name = collection_name
+        self.persist_directory = persist_directory
+        self.use_server = use_server
+        self.server_host = server_host
+        self.server_port = server_port
+        self.debounce_seconds = debounce_seconds
+        self.max_batch = max_batch
+        self.poll_interval = poll_interval
+        self.use_polling = force_polling or not WATCHDOG_AVAILABLE
+        self.on_batch = on_batch
+        if on_batch is None and knn_index_dir:
+            self.on_batch = knn_update_hook(
+                knn_index_dir,
+                collection_name=collection_name,
+                persist_directory=persist_directory,
+                use_server=use_server,
+                server_host=server_host,
+                server_port=server_port
+            )
+
+        # course_id -> (first event time, last event time)
+        self._pending: Dict[str, Tuple[float, float]] = {}
+        # course_id -> first event time, for courses taken by the current batch
+        self._in_flight: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+        self._signatures: Dict[str, FrozenSet[Tuple[str, str]]] = {}
+        if Path(corpus_path).exists():
+            self._signatures = {
+                course_id: _course_signature(course)
+                for course_id, course in iter_course_groups(corpus_path)
+            }
+
+        self.processed_courses = 0
+        self.skipped_courses = 0
+        self.batches = 0
+        self.last_batch_seconds = 0.0
+
+    def notify(self, path: str) -> None:
+        """Record a file event; the course is the first folder under the document root."""
+        try:
+            relative = Path(path).resolve().relative_to(self.document_root)
+        except ValueError:
+            return
+        if not relative.parts:
+            return
+
+        course_id = relative.parts[0]
+        if course_id.startswith("."):
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            first, _ = self._pending.get(course_id, (now, now))
+            self._pending[course_id] = (first, now)
+
+    def _snapshot(self) -> Dict[str, Tuple[float, int]]:
+        snapshot = {}
+        for dirpath, _, filenames in os.walk(self.document_root):
+            for filename in filenames:
+                file_path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(file_path)
+                except OSError:
+                    continue
+                snapshot[file_path] = (stat.st_mtime, stat.st_size)
+        return snapshot
+
+    def _poll_loop(self) -> None:
+        previous = self._snapshot()
+        while not self._stop.wait(self.poll_interval):
+            current = self._snapshot()
+            for file_path in previous.keys() | current.keys():
+                if previous.get(file_path) != current.get(file_path):
+                    self.notify(file_path)
+            previous = current
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Current watcher metrics.
+
+        Returns:
+            Dictionary containing:
+                - 'queue_depth': Courses waiting to be processed or in the current batch
+                - 'lag_seconds': Age of the oldest unprocessed event, including
+                  the current batch (0 when idle)
+                - 'processed_courses', 'skipped_courses', 'batches', 'last_batch_seconds'
+                - 'mode': "inotify" or "polling"
+        """
+        now = time.monotonic()
+        with self._lock:
+            queue_depth = len(self._pending.keys() | self._in_flight.keys())
+            firsts = [first for first, _ in self._pending.values()] + list(self._in_flight.values())
+            lag = max((now - first for first in firsts), default=0.0)
+        return {
+            'queue_depth': queue_depth,
+            'lag_seconds': lag,
+            'processed_courses': self.processed_courses,
+            'skipped_courses': self.skipped_courses,
+            'batches': self.batches,
+            'last_batch_seconds': self.last_batch_seconds,
+            'mode': "polling" if self.use_polling else "inotify"
+        }
+
+    def _take_ready(self) -> List[str]:
+        """Pop up to max_batch courses whose last event is older than the debounce window."""
+        now = time.monotonic()
+        with self._lock:
+            ready = sorted(
+                (course_id for course_id, (_, last) in self._pending.items()
+                 if now - last >= self.debounce_seconds),
+                key=lambda course_id: self._pending[course_id][0]
+            )[:self.max_batch]
+            for course_id in ready:
+                self._in_flight[course_id] = self._pending.pop(course_id)[0]
+        return ready
+
+    def _finish(self, course_ids: List[str], requeue: bool = False) -> None:
+        """
+        Release courses taken by _take_ready. Requeued courses keep their
+        original first-event time, so lag keeps growing across retries, and
+        are retried after the debounce window.
+        """
+        now = time.monotonic()
+        with self._lock:
+            for course_id in course_ids:
+                first = self._in_flight.pop(course_id, now)
+                if requeue:
+                    # Events that arrived during the batch are merged in
+                    pending_first, _ = self._pending.get(course_id, (first, now))
+                    self._pending[course_id] = (min(first, pending_first), now)
+
+    def process_courses(self, course_ids: List[str]) -> List[str]:
+        """
+        Re-extract, re-embed and upsert the given courses in one batch.
+        Courses whose folder is gone are deleted; courses whose extracted
+        records are unchanged are skipped.
+
+        Args:
+            course_ids: Course IDs (folder names) to process
+
+        Returns:
+            Course IDs that were upserted or deleted
+        """
+        start = time.perf_counter()
+
+        records = []
+        deleted = []
+        for course_id in course_ids:
+            course_folder = self.document_root / course_id
+            if course_folder.is_dir():
+                print(f"\nProcessing course: {course_id}")
+                records.extend(extract_course_records(course_folder, self.document_root))
+            else:
+                deleted.append(course_id)
+
+        courses = group_records(records)
+        # Folders that exist but no longer have content are removed as well
+        deleted += [
+            course_id for course_id in course_ids
+            if course_id not in courses and course_id not in deleted
+        ]
+
+        changed = {
+            course_id: course for course_id, course in courses.items()
+            if _course_signature(course) != self._signatures.get(course_id)
+        }
+        self.skipped_courses += len(courses) - len(changed)
+        deleted = [course_id for course_id in deleted if course_id in self._signatures]
+
+        texts, metadatas, ids = build_course_documents(changed, embedding_model=self.model)
+        if texts:
+            print(f"\nEmbedding {len(texts)} course document(s) in one batch...")
+            embeddings = embedding_batch(texts, model=self.model)
+            add_documents_to_vectordb(
+                texts=texts,
+                embeddings=embeddings,
+                metadatas=metadatas,
+                ids=ids,
+                collection_name=self.collection_name,
+                persist_directory=self.persist_directory,
+                embedding_model=self.model,
+                use_server=self.use_server,
+                server_host=self.server_host,
+                server_port=self.server_port,
+                upsert=True
+            )
+        if deleted:
+            print(f"Deleting {len(deleted)} removed course(s): {deleted}")
+            delete_documents_from_vectordb(
+                ids=deleted,
+                collection_name=self.collection_name,
+                persist_directory=self.persist_directory,
+                use_server=self.use_server,
+                server_host=self.server_host,
+                server_port=self.server_port
+            )
+
+        # Record the new state only after the writes succeeded; the corpus
+        # artifact is what a restarted watcher rebuilds its signatures from,
+        # so updating it earlier would make a failed batch look processed.
+        # Unchanged courses already match the artifact, so it is only
+        # rewritten when something changed.
+        affected = set(changed) | set(deleted)
+        if affected:
+            replace_course_records(
+                affected,
+                (record for record in records if record["course_id"] in affected),
+                corpus_path=self.corpus_path
+            )
+        for course_id, course in changed.items():
+            self._signatures[course_id] = _course_signature(course)
+        for course_id in deleted:
+            self._signatures.pop(course_id, None)
+
+        touched = list(ids) + deleted
+        self.processed_courses += len(touched)
+        self.batches += 1
+        self.last_batch_seconds = time.perf_counter() - start
+
+        if touched and self.on_batch:
+            self.on_batch(touched)
+        return touched
+
+    def run(self, status_interval: float = 30.0) -> None:
+        """
+        Watch the document folder until stop() is called or Ctrl+C is pressed.
+
+        Args:
+            status_interval: Seconds between status lines (queue depth and lag)
+        """
+        observer = None
+        poller = None
+        if self.use_polling:
+            poller = threading.Thread(target=self._poll_loop, daemon=True)
+            poller.start()
+        else:
+            observer = Observer()
+            observer.schedule(_EventHandler(self), str(self.document_root), recursive=True)
+            observer.start()
+
+        stats = self.stats()
+        print(f"👀 Watching '{self.document_root}' ({stats['mode']} mode)")
+        print("=" * 60)
+
+        last_status = time.monotonic()
+        try:
+            while not self._stop.is_set():
+                ready = self._take_ready()
+                if ready:
+                    try:
+                        touched = self.process_courses(ready)
+                        self._finish(ready)
+                        print(f"✅ Batch done: {len(touched)} course(s) updated in {self.last_batch_seconds:.2f}s")
+                    except Exception as e:
+                        print(f"❌ Error processing batch {ready}: {e}")
+                        # Requeue so the courses are retried after the debounce window
+                        self._finish(ready, requeue=True)
+                    continue
+
+                if time.monotonic() - last_status >= status_interval:
+                    stats = self.stats()
+                    print(f"Status: queue_depth={stats['queue_depth']} lag={stats['lag_seconds']:.1f}s "
+                          f"processed={stats['processed_courses']} skipped={stats['skipped_courses']}")
+                    last_status = time.monotonic()
+
+                self._stop.wait(min(self.poll_interval, self.debounce_seconds))
+        except KeyboardInterrupt:
+            print("\nStopping watcher...")
+        finally:
+            self._stop.set()
+            if observer is not None:
+                observer.stop()
+                observer.join()
+            if poller is not None:
+                poller.join()
+
+    def stop(self) -> None:
+        """Stop a running watcher."""
+        self._stop.set()
+
+
+if __name__ == "__main__":
+    import sys
+
+    watcher = DocumentWatcher(
+        document_folder="document",
+        force_polling="--poll" in sys.argv,
+        knn_index_dir=DEFAULT_INDEX_DIR if "--knn-index" in sys.argv else None
+    )
+    watcher.run()